@@ -7,7 +7,7 @@ These functions use functional programming.
 
 
 from habit import Habit
-from datetime import date
+from datetime import date, timedelta
 
 
 def get_habits(tracker):   # Get all habits from tracker
@@ -21,58 +21,146 @@ def list_habits_by_periodicity(tracker, periodicity):  # Get habits filtered by
             habits_list.append(habit)
     return habits_list
 
-def current_streak(habit):  # Returns the current streak of a habit
-    return habit.calculate_streak()
+def current_streak(habit, as_of=None):  # Returns the current streak of a habit (as of a date, today by default)
+    return habit.calculate_streak(as_of)
 
-def longest_streak(tracker):  # Returns the longest streak of a habit
+def best_streak(habit):  # Returns the longest streak a habit ever had
+    return habit.best_streak()
+
+def streak_on(habit, day):  # Returns the streak a habit had on a given date
+    return habit.streak_on(day)
+
+def longest_streak(tracker, as_of=None):  # Returns the habit with the longest current streak (as of a date, the tracker's today by default)
     
-    if not tracker.habits:
+    habits = tracker.habits
+    if not habits:
         return None
     
-    longest_habit = tracker.habits[0] 
-    for habit in tracker.habits:
-        if habit.calculate_streak() > longest_habit.calculate_streak():
-            longest_habit = habit
-    return longest_habit
+    as_of = tracker.clock() if as_of is None else as_of
+    return max(habits, key=lambda habit: current_streak(habit, as_of))   # One pass, the first habit wins a tie
 
-def lowest_streak(tracker):  # Returns the habit with the lowest current streak
+def longest_ever_streak(tracker):  # Returns the habit with the longest streak ever (not only the current one)
 
-    if not tracker.habits:
+    habits = tracker.habits
+    if not habits:
         return None
     
-    lowest_habit = tracker.habits[0] 
-    for habit in tracker.habits:
-        if habit.calculate_streak() < lowest_habit.calculate_streak():
-            lowest_habit = habit
-    return lowest_habit
+    return max(habits, key=best_streak)
+
+def lowest_streak(tracker, as_of=None):  # Returns the habit with the lowest current streak (as of a date, the tracker's today by default)
 
-def completion_rate(habit):  
+    habits = tracker.habits
+    if not habits:
+        return None
+    
+    as_of = tracker.clock() if as_of is None else as_of
+    return min(habits, key=lambda habit: current_streak(habit, as_of))   # One pass, the first habit wins a tie
+
+def streak_cache_info():  # Returns how often streaks were answered from the remembered run (hits) or recalculated (misses)
+    return dict(Habit.streak_cache_stats)
+
+def completion_rate(habit, as_of=None):  
     """ 
     Returns the completion rate percentage for a habit based on its periodicity (daily/weekly).
+    as_of: work the rate out as it was on that date (today by default); only completions up to then count.
     """
 
-    if not habit.completions: # Return 0 if there are no completions 
+    if as_of is None:
+        today = date.today()
+        completions = habit.completion_count
+    else:
+        today = as_of
+        completions = habit.count_between(date.min, as_of)   # Later completions didn't exist yet
+
+    if not completions: # Return 0 if there are no completions 
         return 0.0
     
-    today = date.today() #  Calculates days since creation (adds 1 to include creation day)
+    #  Calculates days since creation (adds 1 to include creation day)
     days_since_creation = (today - habit.creation_date).days + 1  
 
     if habit.periodicity == 'daily': # Daily habits: expected to complete once per day
         expected_completions = days_since_creation
-        actual_completions = len(habit.completions)
+        actual_completions = completions
     
     elif habit.periodicity == 'weekly': # Weekly habits: calculate complete weeks since creation
         weeks_since_creation = (days_since_creation + 6 ) // 7 # Round up to the nearest week
         expected_completions = max(1, weeks_since_creation)
-        actual_completions = len(habit.completions)
+        actual_completions = completions
     
-    if expected_completions == 0: 
+    if expected_completions <= 0:   # as_of is before the habit was created
         return 0.0
     
     return (actual_completions / expected_completions) * 100 # Calculate completion percentage
-    
 
 
+# Questions about a period of time. Completions are found by binary search in each
+# habit's sorted ordinals, so each window costs O(log n) whatever its length.
 
+BUCKETS = ('day', 'week', 'month')
 
+def completions_between(habit, start, end):  # Number of completions from start to end (both included)
+    return habit.count_between(start, end)
+
+def periods_between(habit, start, end):  # Days (or weeks) the habit could be completed in from start to end, not counting before it was created
+    start = max(start, habit.creation_date)
+    if start > end:
+        return 0
+    return habit.current_ordinal(end) - habit.current_ordinal(start) + 1
+
+def completion_rate_between(habit, start, end):  # Completion rate (percentage) from start to end
+    expected = periods_between(habit, start, end)
+    if not expected:
+        return 0.0
+    return habit.count_between(max(start, habit.creation_date), end) / expected * 100
+
+def bucket_start(day, bucket):  # First day of the day/week/month a date falls in
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+def next_bucket(first, bucket):  # First day of the following day/week/month
+    if bucket == 'week':
+        return first + timedelta(weeks=1)
+    if bucket == 'month':
+        return date(first.year + first.month // 12, first.month % 12 + 1, 1)
+    return first + timedelta(days=1)
+
+def completion_series(habit, start, end, bucket='week'):
+    """
+    Completions per day, week or month from start to end.
+    Returns a list of (first day of the bucket, completions, completion rate) tuples, oldest first.
+    The first and last buckets only count the days inside the window.
+    """
+
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+
+    series = []
+    first = bucket_start(start, bucket)
+    while first <= end:
+        following = next_bucket(first, bucket)
+        window_start, window_end = max(first, start), min(following - timedelta(days=1), end)
+        series.append((first, habit.count_between(window_start, window_end), completion_rate_between(habit, window_start, window_end)))
+        first = following
+    return series
+
+def heatmap(habit, end, weeks=12):
+    """
+    Calendar of the last few weeks up to end, like a wall calendar with one column per week.
+    Returns (Monday of the first week, rows): rows[weekday][week] is 1 if the habit was
+    done that day (that week, for weekly habits), 0 if not and None for days after end.
+    """
 
+    first_monday = bucket_start(end, 'week') - timedelta(weeks=weeks - 1)
+    done = set(habit.ordinals_between(first_monday, end))   # One binary search, then only the completions shown
+    rows = [[None] * weeks for _ in range(7)]
+    for offset in range((end - first_monday).days + 1):
+        day = first_monday + timedelta(days=offset)
+        rows[day.weekday()][offset // 7] = 1 if habit.current_ordinal(day) in done else 0
+    return first_monday, rows
+
+def streak_timeline(habit, start, end):  # Returns (date, streak) for every day from start to end, in one pass over the days
+    streaks = habit.streak_timeline(start, end)
+    return [(start + timedelta(days=offset), streak) for offset, streak in enumerate(streaks)]
@@ -0,0 +1,50 @@
+"""
+This file writes whole files so they are never left half written.
+The new contents go to a temporary file next to the old one, which is renamed
+over it once complete, so a crash while saving leaves the old file as it was.
+The JSON file, the binary file and the summary file are all written this way.
+"""
+
+
+import contextlib
+import os
+import tempfile
+
+
+def read_umask():   # The process umask; reading it means setting it for a moment, so this is done once at import
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+NEW_FILE_MODE = 0o666 & ~read_umask()   # Permissions of a new file (threads started later, like the server's saver, never see the umask change)
+
+def file_mode(filename):   # Permissions for a rewritten file: the old file's, or the usual ones for a new file
+    try:
+        return os.stat(filename).st_mode & 0o777
+    except FileNotFoundError:
+        return NEW_FILE_MODE
+
+
+@contextlib.contextmanager
+def write_atomically(filename, mode='w', prefix='.habits-', sync=True):
+    """
+    Yields a temporary file (opened with mode) to write the new contents of filename to.
+    When the with block ends without an error the file is flushed (and synced to disk
+    unless sync is False), given filename's permissions, since temporary files are private,
+    and renamed over filename. If anything fails the temporary file is removed.
+    """
+
+    folder = os.path.dirname(os.path.abspath(filename))
+    file = tempfile.NamedTemporaryFile(mode, dir=folder, prefix=prefix, suffix='.tmp', delete=False)
+    try:
+        yield file
+        file.flush()
+        if sync:
+            os.fsync(file.fileno())
+        file.close()
+        os.chmod(file.name, file_mode(filename))
+        os.replace(file.name, filename)
+    except BaseException:
+        file.close()
+        os.remove(file.name)
+        raise
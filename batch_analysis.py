@@ -0,0 +1,155 @@
+"""
+This file answers the same questions as analysis.py, but for all habits at once.
+The completions of every habit are packed into one NumPy array (one after the
+other, with an offsets array saying where each habit starts), so streaks,
+completion rates and gaps are worked out with array operations instead of a
+Python loop per habit and per completion.
+NumPy is only needed for this file; the rest of the app works without it.
+"""
+
+
+from array import array
+from datetime import date
+from habit import week_ordinal
+
+try:
+    import numpy as np
+except ImportError:   # NumPy is optional
+    np = None
+
+
+class HabitBatch:
+    """
+    All completions of a list of habits packed together
+    Attributes:
+    - habits: list of Habit objects, in the same order as every result array
+    - ordinals: int64 array with the completion ordinals of all habits, habit after habit
+    - offsets: int64 array, the completions of habit i are ordinals[offsets[i]:offsets[i + 1]]
+    - current: int64 array, today's day/week ordinal for each habit
+    - days_since_creation: int64 array, days from creation to today (creation day included)
+    - weekly: bool array, True for weekly habits
+    - as_of: the today given, or None for the real today
+    Like analysis.completion_rate, rates as of a given today only count the
+    completions up to that day/week; without one every completion counts.
+    """
+
+    def __init__(self, habits, today=None):
+        if np is None:
+            raise ImportError("batch_analysis needs NumPy: pip install numpy")
+        self.as_of = today
+        if today is None:
+            today = date.today()
+
+        self.habits = list(habits)
+        count = len(self.habits)
+
+        packed = array('i')   # Extending one array is much faster than wrapping each habit's array in NumPy
+        sizes = []
+        for habit in self.habits:
+            ordinals = habit.completion_ordinals()
+            packed.extend(ordinals)
+            sizes.append(len(ordinals))
+        counts = np.array(sizes, dtype=np.int64)
+        self.offsets = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+        self.ordinals = np.frombuffer(packed, dtype=np.intc).astype(np.int64)
+
+        self.weekly = np.fromiter((habit.periodicity == 'weekly' for habit in self.habits), dtype=bool, count=count)
+        self.current = np.where(self.weekly, week_ordinal(today), today.toordinal()).astype(np.int64)
+        creation = np.fromiter((habit.creation_date.toordinal() for habit in self.habits), dtype=np.int64, count=count)
+        self.days_since_creation = today.toordinal() - creation + 1
+
+        self._habit_of = np.repeat(np.arange(count, dtype=np.int64), counts)   # Habit index of each completion
+        self._runs = None
+
+        # ordinal - position stays the same along a run of consecutive days/weeks and only grows
+        # inside a habit, so (habit, ordinal - position) is sorted and equal within each run
+        positions = np.arange(len(self.ordinals), dtype=np.int64)
+        self._keys = self._habit_of * (1 << 32) + self.ordinals   # Sorted, because each habit's ordinals are sorted
+        self._run_keys = self._habit_of * (1 << 40) + (self.ordinals - positions + (1 << 36))
+
+    @property
+    def counts(self):   # Number of completions of each habit
+        return np.diff(self.offsets)
+
+    def runs(self):
+        """
+        Runs of consecutive days/weeks of all habits, for example completions
+        on days 1, 2, 3, 5 make two runs of 3 and 1.
+        Returns two arrays: the habit index and the length of each run, habit after habit.
+        """
+
+        if self._runs is None:
+            starts = np.ones(len(self.ordinals), dtype=bool)   # True where a new run starts
+            starts[1:] = self._run_keys[1:] != self._run_keys[:-1]
+            first = np.flatnonzero(starts)
+            lengths = np.diff(np.append(first, len(self.ordinals)))
+            self._runs = (self._habit_of[first], lengths)
+        return self._runs
+
+    def current_streaks(self):   # Same as analysis.current_streak for every habit
+        wanted = np.arange(len(self.habits), dtype=np.int64) * (1 << 32) + self.current
+        positions = np.searchsorted(self._keys, wanted)
+        found = positions < self.offsets[1:]   # Position still inside the habit's completions...
+        found[found] = self._keys[positions[found]] == wanted[found]   # ...and today/this week is completed
+        today_positions = positions[found]
+        run_starts = np.searchsorted(self._run_keys, self._run_keys[today_positions])   # First completion of that run
+        streaks = np.zeros(len(self.habits), dtype=np.int64)
+        streaks[found] = today_positions - run_starts + 1
+        return streaks
+
+    def longest_runs(self):   # Longest streak each habit ever had (0 without completions)
+        run_habits, lengths = self.runs()
+        first_runs = np.searchsorted(run_habits, np.arange(len(self.habits)))   # Index of each habit's first run
+        return self._per_habit_max(lengths, first_runs)
+
+    def completion_rates(self):   # Same as analysis.completion_rate for every habit
+        expected = np.where(self.weekly, np.maximum(1, (self.days_since_creation + 6) // 7), self.days_since_creation)
+        counts = self.counts
+        if self.as_of is not None:   # Completions after that day/week didn't exist yet
+            wanted = np.arange(len(self.habits), dtype=np.int64) * (1 << 32) + self.current
+            counts = np.searchsorted(self._keys, wanted, side='right') - self.offsets[:-1]
+        rates = np.zeros(len(self.habits), dtype=np.float64)
+        valid = (counts > 0) & (expected > 0)   # Nothing expected yet before the habit was created
+        rates[valid] = counts[valid] / expected[valid] * 100
+        return rates
+
+    def gap_stats(self):
+        """
+        Missed days/weeks between completions for each habit.
+        Returns two arrays: the longest gap and the average gap (0 with fewer than two completions).
+        """
+
+        gaps = np.zeros(len(self.ordinals), dtype=np.int64)   # Gap before each completion, 0 for a habit's first one
+        gaps[1:] = np.diff(self.ordinals) - 1
+        gaps[self.offsets[:-1][self.counts > 0]] = 0
+        longest = self._per_habit_max(gaps, self.offsets[:-1])
+        totals = np.bincount(self._habit_of, weights=gaps, minlength=len(self.habits))
+        average = totals / np.maximum(self.counts - 1, 1)
+        return longest, average
+
+    def _per_habit_max(self, values, starts):   # Largest value of each habit, values of habit i begin at starts[i] (0 without completions)
+        result = np.zeros(len(self.habits), dtype=np.int64)
+        has_completions = self.counts > 0
+        if has_completions.any():   # reduceat goes from each start to the next one, so empty habits are left out
+            result[has_completions] = np.maximum.reduceat(values, starts[has_completions])
+        return result
+
+
+def current_streaks(habits, today=None):   # Current streak of every habit, as an array
+    return HabitBatch(habits, today).current_streaks()
+
+def completion_rates(habits, today=None):   # Completion rate of every habit, as an array
+    return HabitBatch(habits, today).completion_rates()
+
+def longest_streak(tracker, today=None):   # Same as analysis.longest_streak (as of the tracker's today by default)
+    habits = tracker.habits
+    if not habits:
+        return None
+    return habits[int(np.argmax(current_streaks(habits, tracker.clock() if today is None else today)))]   # argmax returns the first habit on a tie
+
+def lowest_streak(tracker, today=None):   # Same as analysis.lowest_streak (as of the tracker's today by default)
+    habits = tracker.habits
+    if not habits:
+        return None
+    return habits[int(np.argmin(current_streaks(habits, tracker.clock() if today is None else today)))]
@@ -0,0 +1,244 @@
+"""
+This file runs the habit tracker without the menu, for scripts and cron jobs.
+Each command loads the data file once, applies every row it reads from stdin
+(CSV with a header row, JSON lines, or column chunks from bulk_io), saves and prints JSON.
+
+python main.py add < new_habits.csv          (columns: name, periodicity, creation_date optional)
+python main.py complete 3 5                   (habit IDs or names; rows with id/name and date optional from stdin)
+python main.py remove 4                       (habit IDs or names, or rows with id/name from stdin)
+python main.py import < history.csv           (columns: name, periodicity, creation_date optional, date; saved every batch)
+python main.py export > history.csv           (one row per completion, --format columns for column chunks)
+python main.py due --hours 6                  (one JSON line per habit due within the next 6 hours, earliest first)
+python main.py list                           (one JSON line per habit)
+python main.py stats                          (one JSON object)
+Add --file to use another data file (a .db file uses SQLite).
+"""
+
+
+import argparse
+import contextlib
+import csv
+import itertools
+import json
+import sys
+from datetime import date
+
+import analysis
+import bulk_io
+from habit_tracker import HabitTracker
+from scheduler import Scheduler, streak_at_stake
+from storage import open_storage
+
+
+PERIODICITIES = ('daily', 'weekly')
+
+
+def read_rows(stream, input_format='auto'):
+    """
+    Yields (line number, dict) for each input row, or (line number, None) for a line that isn't a JSON object.
+    input_format is 'csv', 'jsonl', 'columns' or 'auto' (JSON lines if the first row starts with '{',
+    column chunks if that JSON object holds lists).
+    """
+
+    if input_format == 'columns':
+        yield from bulk_io.read_columns(stream)
+        return
+
+    first = stream.readline()
+    while first and not first.strip():   # Skips blank lines at the start
+        first = stream.readline()
+    lines = itertools.chain([first], stream)
+    if input_format == 'auto':
+        input_format = 'jsonl' if first.lstrip().startswith('{') else 'csv'
+        if input_format == 'jsonl' and is_column_chunk(first):
+            yield from bulk_io.read_columns(lines)
+            return
+
+    if input_format == 'jsonl':
+        for line_number, line in enumerate(lines, 1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield line_number, row if isinstance(row, dict) else None
+    else:
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, {key.strip(): (value or '').strip() for key, value in row.items() if key}
+
+
+def is_column_chunk(line):   # True for a JSON line whose name holds a list (a chunk written by bulk_io.write_columns)
+    try:
+        return isinstance(json.loads(line).get('name'), list)
+    except (ValueError, AttributeError):
+        return False
+
+
+def row_name(row):   # The row's name column; JSON rows can hold anything, and the tracker needs text
+    name = row.get('name')
+    if name is not None and not isinstance(name, str):
+        raise ValueError(f"name must be text, not {name!r}")
+    return name
+
+def find_habit(tracker, row):   # Finds the habit named by a row's id or name column
+    if row.get('id') not in (None, ''):
+        return tracker.get_habit_by_id(int(row['id']))
+    if row_name(row):
+        return tracker.get_habit_by_name(row['name'])
+    raise ValueError("row needs an id or a name")
+
+
+def check_periodicity(periodicity):
+    if periodicity not in PERIODICITIES:
+        raise ValueError(f"periodicity must be 'daily' or 'weekly', not {periodicity!r}")
+    return periodicity
+
+
+def optional_date(row, key):   # The row's date column as a date, or None if it is empty
+    value = row.get(key)
+    return date.fromisoformat(value) if value else None
+
+
+def add_row(tracker, row):
+    periodicity = check_periodicity(str(row.get('periodicity', '')).lower())
+    if not row_name(row):
+        raise ValueError("row needs a name")
+    tracker.insert_habit(row['name'], periodicity, optional_date(row, 'creation_date'))
+    return True
+
+def complete_row(tracker, row):
+    habit = find_habit(tracker, row)
+    if habit is None:
+        raise ValueError("habit not found")
+    day = optional_date(row, 'date')
+    if day is None:
+        day = tracker.clock()
+    if day.toordinal() < bulk_io.first_day(habit):   # Same check as import
+        raise ValueError(f"{day.isoformat()} is before habit '{habit.name}' was created ({habit.creation_date.isoformat()})")
+    return tracker.add_completion(habit.id, day.isoformat())
+
+def remove_row(tracker, row):
+    habit = find_habit(tracker, row)
+    if habit is None:
+        raise ValueError("habit not found")
+    return tracker.delete_habit(habit.id)
+
+ROW_COMMANDS = {'add': add_row, 'complete': complete_row, 'remove': remove_row}
+
+
+def apply_rows(tracker, command, rows):   # Applies every row, returns the summary printed as JSON
+    summary = {'command': command, 'rows': 0, 'changed': 0, 'unchanged': 0, 'errors': []}
+    apply = ROW_COMMANDS[command]
+    for line_number, row in rows:
+        summary['rows'] += 1
+        if row is None:
+            summary['errors'].append({'line': line_number, 'error': "not a JSON object"})
+            continue
+        try:
+            if apply(tracker, row):
+                summary['changed'] += 1
+            else:
+                summary['unchanged'] += 1
+        except (ValueError, KeyError, TypeError) as error:
+            summary['errors'].append({'line': line_number, 'error': str(error)})
+    return summary
+
+
+def habit_summary(habit, as_of=None):   # One habit as a JSON-friendly dict, streak and rate as of a date (pass the tracker's clock())
+    return {
+        'id': habit.id,
+        'name': habit.name,
+        'periodicity': habit.periodicity,
+        'creation_date': habit.creation_date.isoformat(),
+        'completions': habit.completion_count,
+        'streak': analysis.current_streak(habit, as_of),
+        'best_streak': analysis.best_streak(habit),
+        'completion_rate': round(analysis.completion_rate(habit, as_of), 2),
+    }
+
+
+def tracker_stats(tracker):   # Counts and the habits with the longest/lowest streaks
+    def named(habit, streak):
+        return None if habit is None else {'id': habit.id, 'name': habit.name, 'streak': streak(habit)}
+
+    today = tracker.clock()
+    habits = tracker.habits
+    return {
+        'habits': len(habits),
+        'daily': len(analysis.list_habits_by_periodicity(tracker, 'daily')),
+        'weekly': len(analysis.list_habits_by_periodicity(tracker, 'weekly')),
+        'completions': sum(habit.completion_count for habit in habits),
+        'longest_streak': named(analysis.longest_streak(tracker, today), lambda habit: analysis.current_streak(habit, today)),
+        'lowest_streak': named(analysis.lowest_streak(tracker, today), lambda habit: analysis.current_streak(habit, today)),
+        'best_streak_ever': named(analysis.longest_ever_streak(tracker), analysis.best_streak),
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='main.py', description="Habit tracker batch commands")
+    parser.add_argument('--file', default='habits.json', help="data file (default habits.json, .db for SQLite)")
+    parser.add_argument('--format', default='auto', choices=['auto', 'csv', 'jsonl', 'columns'],
+        help="format of the rows on stdin (export writes CSV unless it is columns)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('add', help="add habits (rows: name, periodicity, creation_date)")
+    commands.add_parser('complete', help="complete habits (arguments or rows: id/name, date)").add_argument('habits', nargs='*')
+    commands.add_parser('remove', help="remove habits (arguments or rows: id/name)").add_argument('habits', nargs='*')
+    commands.add_parser('import', help="import completions (rows: name, periodicity, creation_date, date)")
+    commands.add_parser('export', help="write every completion as a row (name, periodicity, creation_date, date)")
+    commands.add_parser('due', help="print the habits due within the next hours as JSON lines").add_argument(
+        '--hours', type=float, default=24, help="how far ahead to look (default 24)")
+    commands.add_parser('list', help="print every habit as a JSON line")
+    commands.add_parser('stats', help="print streak and completion statistics as JSON")
+    return parser
+
+
+def argument_rows(values):   # Habit IDs or names given on the command line, as rows
+    for position, value in enumerate(values, 1):
+        yield position, {'id': value} if value.isdigit() else {'name': value}
+
+
+def main(argv=None, stdin=None, stdout=None):
+    args = build_parser().parse_args(argv)
+    stdin = sys.stdin if stdin is None else stdin
+    stdout = sys.stdout if stdout is None else stdout
+
+    exit_code = 0   # 1 if any row had an error
+    tracker = HabitTracker()
+    storage = open_storage(args.file, lazy=args.command in ('list', 'stats', 'export'))
+    with contextlib.redirect_stdout(sys.stderr):   # Messages meant for people go to stderr, JSON to stdout
+        storage.load(tracker)
+
+        if args.command == 'list':
+            for habit in tracker.habits:
+                stdout.write(json.dumps(habit_summary(habit, tracker.clock())) + '\n')
+        elif args.command == 'stats':
+            stdout.write(json.dumps(tracker_stats(tracker)) + '\n')
+        elif args.command == 'due':
+            for due, habit in Scheduler(tracker).due_within(args.hours):
+                stdout.write(json.dumps({'id': habit.id, 'name': habit.name, 'periodicity': habit.periodicity,
+                    'due': due.isoformat(), 'streak': streak_at_stake(habit)}) + '\n')
+        elif args.command == 'export':
+            rows = bulk_io.completion_rows(tracker.habits)
+            if args.format == 'columns':
+                bulk_io.write_columns(rows, stdout)
+            else:
+                bulk_io.write_csv(rows, stdout)
+        elif args.command == 'import':   # Saved after every batch, so huge histories don't pile up unsaved
+            summary = bulk_io.import_rows(tracker, read_rows(stdin, args.format), lambda: storage.save_changes(tracker))
+            stdout.write(json.dumps(summary) + '\n')
+            if summary['error_count']:
+                exit_code = 1
+        else:
+            if getattr(args, 'habits', None):
+                rows = argument_rows(args.habits)
+            else:
+                rows = read_rows(stdin, args.format)
+            summary = apply_rows(tracker, args.command, rows)
+            storage.save_changes(tracker)   # One save for the whole batch
+            stdout.write(json.dumps(summary) + '\n')
+            if summary['errors']:
+                exit_code = 1
+
+    storage.close()
+    return exit_code
@@ -0,0 +1,5 @@
+"""
+Benchmarks for the habit tracker. Each module can be run on its own, for example:
+
+python -m benchmarks.bench_batch_analysis
+"""
@@ -0,0 +1,106 @@
+"""
+Compares analysis.py (one habit at a time) with batch_analysis.py (all habits at once)
+on a large number of made-up habits: current streaks and completion rates, and the
+longest run and longest gap of every habit.
+
+python -m benchmarks.bench_batch_analysis [--sizes 10000 100000] [--output bench_batch_analysis.json]
+"""
+
+
+import argparse
+from array import array
+
+import analysis
+import batch_analysis
+from benchmarks.generator import generate_habits
+from benchmarks.measure import measure, write_results
+from habit import Habit
+
+
+def history_stats(habit):   # Longest run and longest gap of one habit with a plain Python loop
+    longest_run = longest_gap = run = 0
+    previous = None
+    for ordinal in habit.completion_ordinals():
+        if previous is not None and ordinal == previous + 1:
+            run += 1
+        else:
+            run = 1
+            if previous is not None:
+                longest_gap = max(longest_gap, ordinal - previous - 1)
+        longest_run = max(longest_run, run)
+        previous = ordinal
+    return longest_run, longest_gap
+
+
+def fresh(habits):   # Returns a setup function giving copies of the habits with no remembered streak yet, like right after loading the file
+    def setup():
+        return [Habit.from_ordinals(habit.id, habit.name, habit.periodicity, habit.creation_date,
+            array('i', habit.completion_ordinals())) for habit in habits]
+    return setup
+
+
+def packed(habits):   # Returns a setup function giving a HabitBatch of the habits
+    return lambda: batch_analysis.HabitBatch(fresh(habits)())
+
+
+def streaks_and_rates(habits):
+    return [analysis.current_streak(habit) for habit in habits], [analysis.completion_rate(habit) for habit in habits]
+
+
+def batch_streaks_and_rates(batch):
+    return list(batch.current_streaks()), list(batch.completion_rates())
+
+
+def runs_and_gaps(habits):
+    return [history_stats(habit) for habit in habits]
+
+
+def batch_runs_and_gaps(batch):
+    return list(zip(batch.longest_runs(), batch.gap_stats()[0]))
+
+
+def check(habits):   # Raises an error if both ways don't give the same answers
+    streaks, rates = streaks_and_rates(fresh(habits)())
+    batch_streaks, batch_rates = batch_streaks_and_rates(packed(habits)())
+    if batch_streaks != streaks or any(abs(a - b) > 1e-9 for a, b in zip(batch_rates, rates)):
+        raise RuntimeError("batch_analysis gives other streaks or completion rates than analysis.py")
+    if batch_runs_and_gaps(packed(habits)()) != runs_and_gaps(habits):
+        raise RuntimeError("batch_analysis gives other longest runs or gaps than the plain loop")
+
+
+def run(sizes, repeat):
+    results = []
+    for habit_count in sizes:
+        habits = generate_habits(habit_count)
+        print(f"{habit_count} habits, {sum(habit.completion_count for habit in habits)} completions")
+        check(habits)
+
+        measured = [
+            ('streaks + rates (one at a time)', fresh(habits), streaks_and_rates),
+            ('packing the completions', fresh(habits), batch_analysis.HabitBatch),
+            ('streaks + rates (batch, packed)', packed(habits), batch_streaks_and_rates),
+            ('runs + gaps (one at a time)', fresh(habits), runs_and_gaps),
+            ('runs + gaps (batch, packed)', packed(habits), batch_runs_and_gaps),
+        ]
+        for name, setup, function in measured:
+            result = measure(setup, function, repeat)
+            result.update({'operation': name, 'habits': habit_count})
+            results.append(result)
+            print(f"  {name:<32} {result['seconds'] * 1000:9.1f} ms  peak {result['peak_bytes'] / 1024:9.0f} KiB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch_analysis against analysis.py one habit at a time")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='bench_batch_analysis.json')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    write_results(args.output, 'batch_analysis', results)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
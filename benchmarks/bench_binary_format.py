@@ -0,0 +1,95 @@
+"""
+Compares the binary habits file with the JSON file: size on disk, the time to
+read it (json.load alone, and loading a whole HabitTracker) and the time to
+count last month's completions of every habit.
+
+python -m benchmarks.bench_binary_format [--sizes 1000x1 10000x2] [--output bench_binary_format.json]
+(each size is <number of habits>x<years>)
+"""
+
+
+import argparse
+import json
+import os
+import tempfile
+from bisect import bisect_left
+from datetime import date, timedelta
+
+import binary_format
+from benchmarks.generator import write_habits_file
+from benchmarks.hot_paths import parse_size
+from benchmarks.measure import measure, write_results
+from habit import week_ordinal
+from habit_tracker import HabitTracker
+
+
+def json_load(filename):
+    with open(filename) as file:
+        json.load(file)
+
+
+def count_recent_from_json(filename, since):   # Completions since a date, for every habit, from the JSON file
+    tracker = HabitTracker()
+    tracker.load_file(filename)
+    total = 0
+    for habit in tracker.habits:
+        ordinals = habit.completion_ordinals()
+        total += len(ordinals) - bisect_left(ordinals, habit.current_ordinal(since))
+    return total
+
+
+def count_recent_from_binary(filename, since):   # The same straight from the mapped binary file, without building habits
+    snapshot = binary_format.BinarySnapshot(filename)
+    first = {'daily': since.toordinal(), 'weekly': week_ordinal(since)}
+    total = 0
+    for index in range(snapshot.habit_count):
+        _, _, periodicity, _ = snapshot.entry(index)
+        total += snapshot.count_between(index, first[periodicity], 2 ** 32 - 1)
+    snapshot.close()
+    return total
+
+
+def run(sizes, repeat):
+    results = []
+    since = date.today() - timedelta(days=30)
+    with tempfile.TemporaryDirectory() as folder:
+        for habit_count, years in sizes:
+            json_name = os.path.join(folder, f'habits_{habit_count}_{years}.json')
+            binary_name = json_name[:-len('.json')] + '.hbin'
+            completions = write_habits_file(json_name, habit_count, years)
+            binary_format.json_to_binary(json_name, binary_name)
+            assert count_recent_from_json(json_name, since) == count_recent_from_binary(binary_name, since)
+
+            measured = [
+                ('json.load', lambda: json_name, json_load),
+                ('load_file (JSON)', lambda: json_name, lambda name: HabitTracker().load_file(name)),
+                ('read_binary', lambda: binary_name, binary_format.read_binary),
+                ('last 30 days (JSON)', lambda: json_name, lambda name: count_recent_from_json(name, since)),
+                ('last 30 days (binary)', lambda: binary_name, lambda name: count_recent_from_binary(name, since)),
+            ]
+            sizes_on_disk = {'json_bytes': os.path.getsize(json_name), 'binary_bytes': os.path.getsize(binary_name)}
+            print(f"{habit_count} habits x {years} years, {completions} completions: "
+                f"JSON {sizes_on_disk['json_bytes']} bytes, binary {sizes_on_disk['binary_bytes']} bytes "
+                f"({sizes_on_disk['json_bytes'] / sizes_on_disk['binary_bytes']:.1f}x smaller)")
+            for name, setup, function in measured:
+                result = measure(setup, function, repeat)
+                result.update({'operation': name, 'habits': habit_count, 'years': years, 'completions': completions}, **sizes_on_disk)
+                results.append(result)
+                print(f"  {name:<22} {result['seconds'] * 1000:9.1f} ms  peak {result['peak_bytes'] / 1024:9.0f} KiB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the binary habits file against JSON")
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=[(1000, 1), (10000, 2)])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='bench_binary_format.json')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    write_results(args.output, 'binary_format', results)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
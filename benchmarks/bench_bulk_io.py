@@ -0,0 +1,103 @@
+"""
+Compares the streaming CSV and column importers/exporters of bulk_io with the
+JSON data file, in rows (completions) per second: exporting every completion,
+writing the JSON file, importing a history into an empty tracker (with and
+without saving along the way) and loading the JSON file.
+
+python -m benchmarks.bench_bulk_io [--sizes 1000x1 3000x1] [--output bench_bulk_io.json]
+(each size is <number of habits>x<years>)
+"""
+
+
+import argparse
+import os
+import tempfile
+
+import bulk_io
+from batch_cli import read_rows
+from benchmarks.generator import write_habits_file
+from benchmarks.hot_paths import parse_size
+from benchmarks.measure import measure, write_results
+from habit_tracker import HabitTracker
+from storage import JsonStorage
+
+
+def loaded(filename):   # Returns a setup function giving a freshly loaded tracker
+    def setup():
+        tracker = HabitTracker()
+        tracker.load_file(filename)
+        return tracker
+    return setup
+
+
+def export(writer, filename):   # Writes every completion of a tracker to filename with writer
+    def run(tracker):
+        with open(filename, 'w', newline='') as file:
+            writer(bulk_io.completion_rows(tracker.habits), file)
+    return run
+
+
+def import_into(rows_file, input_format, data_file, saved):   # Imports rows_file into an empty tracker saved to data_file
+    def setup():
+        for name in (data_file, data_file + '.log'):
+            if os.path.exists(name):
+                os.remove(name)
+        return None
+
+    def run(_):
+        tracker = HabitTracker()
+        storage = JsonStorage(data_file)
+        storage.load(tracker)
+        with open(rows_file, newline='') as file:
+            bulk_io.import_rows(tracker, read_rows(file, input_format), (lambda: storage.save_changes(tracker)) if saved else None)
+        storage.save_changes(tracker)
+    return setup, run
+
+
+def run(sizes, repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for habit_count, years in sizes:
+            json_name = os.path.join(folder, f'habits_{habit_count}_{years}.json')
+            csv_name = os.path.join(folder, 'history.csv')
+            columns_name = os.path.join(folder, 'history.jsonl')
+            imported = os.path.join(folder, 'imported.json')
+            completions = write_habits_file(json_name, habit_count, years)
+            export(bulk_io.write_csv, csv_name)(loaded(json_name)())
+            export(bulk_io.write_columns, columns_name)(loaded(json_name)())
+            print(f"{habit_count} habits x {years} years, {completions} completions: CSV {os.path.getsize(csv_name)} bytes, "
+                f"columns {os.path.getsize(columns_name)} bytes, JSON {os.path.getsize(json_name)} bytes")
+
+            measured = [
+                ('export CSV', loaded(json_name), export(bulk_io.write_csv, csv_name)),
+                ('export columns', loaded(json_name), export(bulk_io.write_columns, columns_name)),
+                ('save_file (JSON)', loaded(json_name), lambda tracker: tracker.save_file(imported)),
+                ('import CSV', *import_into(csv_name, 'csv', imported, saved=False)),
+                ('import columns', *import_into(columns_name, 'columns', imported, saved=False)),
+                ('import CSV, saving as it goes', *import_into(csv_name, 'csv', imported, saved=True)),
+                ('load_file (JSON)', lambda: json_name, lambda name: HabitTracker().load_file(name)),
+            ]
+            for name, setup, function in measured:
+                result = measure(setup, function, repeat)
+                result.update({'operation': name, 'habits': habit_count, 'years': years, 'completions': completions,
+                    'rows_per_second': completions / result['seconds']})
+                results.append(result)
+                print(f"  {name:<30} {result['seconds'] * 1000:9.1f} ms  {result['rows_per_second']:12,.0f} rows/s  "
+                    f"peak {result['peak_bytes'] / 1024:9.0f} KiB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CSV and column import/export against the JSON file")
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=[(1000, 1), (3000, 1)])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='bench_bulk_io.json')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    write_results(args.output, 'bulk_io', results)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Times reports.run_report over many made-up habit files with 1, 2, 4 and 8 worker processes.
+
+python -m benchmarks.bench_reports [--files 400] [--habits 50] [--workers 1 2 4 8] [--output bench_reports.json]
+"""
+
+
+import argparse
+import os
+import tempfile
+import time
+
+import reports
+from benchmarks.generator import write_habits_file
+from benchmarks.measure import write_results
+
+
+def run(file_count, habit_count, worker_counts):
+    with tempfile.TemporaryDirectory() as folder:
+        filenames = []
+        for number in range(file_count):
+            filename = os.path.join(folder, f"user_{number}.json")
+            write_habits_file(filename, habit_count, seed=number)
+            filenames.append(filename)
+
+        results = []
+        expected = None
+        for workers in worker_counts:
+            start = time.perf_counter()
+            report = reports.run_report(filenames, workers=workers)
+            seconds = time.perf_counter() - start
+            if expected is None:
+                expected = report
+            assert report == expected   # Same report whatever the number of workers
+            result = {'workers': workers, 'files': file_count, 'habits': report['habits'], 'seconds': seconds,
+                'files_per_second': file_count / seconds, 'speedup': results[0]['seconds'] / seconds if results else 1.0}
+            results.append(result)
+            print(f"{workers} workers: {seconds:.3f} s, {result['files_per_second']:.0f} files/s, {result['speedup']:.2f}x")
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parallel report over many habit files")
+    parser.add_argument('--files', type=int, default=400)
+    parser.add_argument('--habits', type=int, default=50, help="habits per file")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--output', default='bench_reports.json')
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU cores, {args.files} files with {args.habits} habits each")
+    results = run(args.files, args.habits, args.workers)
+    write_results(args.output, 'reports', results)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Times the scheduler against working it out from every habit: building the
+deadline heap, asking which habits are at risk in the next hours, and keeping
+the heap up to date while habits are completed.
+
+python -m benchmarks.bench_scheduler [--sizes 1000 10000 100000] [--output bench_scheduler.json]
+"""
+
+
+import argparse
+from array import array
+import contextlib
+import gc
+import io
+from datetime import date, datetime, timedelta
+
+import scheduler
+from benchmarks.generator import generate_habits
+from benchmarks.measure import measure, write_results
+from habit import Habit
+from habit_tracker import HabitTracker
+
+
+TODAY = date(2025, 3, 5)
+EVENING = datetime(2025, 3, 5, 21)   # Three hours before the daily habits not done today break their run
+MORNING = datetime(2025, 3, 5, 9)   # Nothing is due in the next hours
+HOURS = 6
+
+
+def at_risk_from_every_habit(tracker, when):   # The same question without the scheduler: a deadline for every habit, then sorted
+    now = scheduler.moment(when)
+    found = []
+    for habit in tracker.habits:
+        due = scheduler.deadline(habit)
+        if now < due <= now + HOURS / 24 and habit.completion_count:
+            found.append((due, habit.id))
+    return sorted(found)
+
+
+def scheduled(habits, asked=None):   # Returns a setup function giving a tracker with a built scheduler (already asked once at asked)
+    def setup():
+        tracker = HabitTracker(clock=lambda: TODAY)
+        tracker.habits = [Habit.from_ordinals(habit.id, habit.name, habit.periodicity, habit.creation_date,
+            array('i', habit.completion_ordinals())) for habit in habits]   # Copies, as the completions change them
+        planner = scheduler.Scheduler(tracker)
+        planner.rebuild()
+        if asked is not None:   # The first question moves the passed deadlines out of the heap
+            planner.at_risk(HOURS, asked)
+        gc.collect()   # Otherwise a full collection of all these new objects lands in whatever is timed next
+        return tracker, planner
+    return setup
+
+
+def complete_many(state):   # Completes 1000 habits today, each one moving its deadline in the heap
+    tracker, _ = state
+    with contextlib.redirect_stdout(io.StringIO()):
+        for habit_id in range(1, min(1000, len(tracker.habits)) + 1):
+            tracker.complete_habit(habit_id)
+
+
+def run(sizes, repeat):
+    results = []
+    for habit_count in sizes:
+        habits = generate_habits(habit_count, days=14, end=TODAY - timedelta(days=1))
+        tracker, planner = scheduled(habits)()
+        for when in (EVENING, MORNING):
+            risky = planner.at_risk(HOURS, when)
+            assert [(due.toordinal(), habit.id) for due, habit in risky] == at_risk_from_every_habit(tracker, when)
+            print(f"{habit_count} habits, {len(risky)} at risk in the {HOURS} hours after {when:%H:%M}")
+
+        measured = [
+            ('build heap', scheduled(habits), lambda state: state[1].rebuild()),
+            ('1000 completions', scheduled(habits), complete_many),
+        ]
+        for when in (EVENING, MORNING):
+            measured += [
+                (f'at risk at {when:%H:%M} (scheduler)', scheduled(habits, when), lambda state, when=when: state[1].at_risk(HOURS, when)),
+                (f'at risk at {when:%H:%M} (every habit)', scheduled(habits), lambda state, when=when: at_risk_from_every_habit(state[0], when)),
+            ]
+        for name, setup, function in measured:
+            result = measure(setup, function, repeat)
+            result.update({'operation': name, 'habits': habit_count})
+            results.append(result)
+            print(f"  {name:<32} {result['seconds'] * 1000:9.3f} ms  peak {result['peak_bytes'] / 1024:9.0f} KiB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the deadline scheduler against checking every habit")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='bench_scheduler.json')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    write_results(args.output, 'scheduler', results)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
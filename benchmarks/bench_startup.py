@@ -0,0 +1,70 @@
+"""
+Times what someone starting the menu waits for: loading the data (time to the
+first menu) and the first list of all habits, without a summary file (first
+start of the day) and with one (every start after that).
+
+python -m benchmarks.bench_startup [--sizes 1000x1 10000x2 50000x2] [--output bench_startup.json]
+(each size is <number of habits>x<years>)
+"""
+
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from benchmarks.generator import write_habits_file
+from benchmarks.hot_paths import parse_size
+from benchmarks.measure import write_results
+from main import HabitTrackerCLI
+from summary_cache import summary_name
+
+
+def start_and_list(filename):   # Seconds to start the menu and to show the first list
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        app = HabitTrackerCLI(filename)
+        app.start()
+        loaded = time.perf_counter()
+        app.list_all_habits()
+        listed = time.perf_counter()
+    return loaded - start, listed - loaded
+
+
+def run(sizes, repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for habit_count, years in sizes:
+            filename = os.path.join(folder, f'habits_{habit_count}_{years}.json')
+            completions = write_habits_file(filename, habit_count, years)
+            print(f"{habit_count} habits x {years} years, {completions} completions")
+
+            for summary in ('none', 'today'):
+                timings = []
+                for _ in range(repeat):
+                    if summary == 'none' and os.path.exists(summary_name(filename)):
+                        os.remove(summary_name(filename))
+                    timings.append(start_and_list(filename))   # Also writes the summary file used by the next runs
+                load_seconds, list_seconds = min(timings)
+                results.append({'habits': habit_count, 'years': years, 'completions': completions, 'summary_file': summary,
+                    'start_seconds': load_seconds, 'first_list_seconds': list_seconds})
+                print(f"  summary file {summary:<6} start {load_seconds * 1000:8.1f} ms   first list {list_seconds * 1000:8.1f} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark starting the menu and the first habit list")
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=[(1000, 1), (10000, 2), (50000, 2)])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='bench_startup.json')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    write_results(args.output, 'startup', results)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Makes up habits for the benchmarks.
+The same arguments always give the same habits, so results from different
+runs (or releases) can be compared.
+"""
+
+
+import json
+import random
+from datetime import date, timedelta
+
+from habit import Habit
+
+
+def generate_habits(habit_count, years=1, seed=0, end=None, days=None):
+    """
+    Returns habit_count Habit objects with `years` years (or `days` days) of history ending on `end` (default today)
+    - About 30% of the habits are weekly, the rest daily
+    - Each habit has its own reliability between 30% and 95%, so streaks and gaps vary
+    """
+
+    rng = random.Random(seed)
+    if end is None:
+        end = date.today()
+    creation_date = end - timedelta(days=365 * years if days is None else days)
+    days = (end - creation_date).days
+
+    habits = []
+    for habit_id in range(1, habit_count + 1):
+        periodicity = 'weekly' if rng.random() < 0.3 else 'daily'
+        step = 7 if periodicity == 'weekly' else 1
+        chance = rng.uniform(0.3, 0.95)   # How reliable this habit is
+        completions = [(creation_date + timedelta(days=day)).isoformat() for day in range(0, days + 1, step) if rng.random() < chance]
+        habits.append(Habit(habit_id, f"Habit {habit_id}", periodicity, creation_date, completions))
+    return habits
+
+
+def write_habits_file(filename, habit_count, years=1, seed=0, end=None):   # Writes generated habits in the habits.json format
+    habits = generate_habits(habit_count, years, seed, end)
+    habits_data = [{'id': habit.id, 'name': habit.name, 'periodicity': habit.periodicity,
+        'creation_date': habit.creation_date.isoformat(), 'completions': habit.completions} for habit in habits]
+    with open(filename, 'w') as file:
+        json.dump({'format': 2, 'habits': habits_data}, file, indent=2)
+    return sum(habit.completion_count for habit in habits)
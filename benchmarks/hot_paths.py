@@ -0,0 +1,83 @@
+"""
+Measures how the main operations scale with the number of habits and years of history:
+load_file, save_file, get_habit_by_id, calculate_streak, completion_rate and longest_streak.
+Results are printed and saved as JSON, so two releases can be compared.
+
+python -m benchmarks.hot_paths [--sizes 100x1 1000x2 10000x2] [--output bench_results.json]
+(each size is <number of habits>x<years>)
+"""
+
+
+import argparse
+import os
+import random
+import tempfile
+
+import analysis
+from benchmarks.generator import write_habits_file
+from benchmarks.measure import measure, write_results
+from habit_tracker import HabitTracker
+
+
+def loaded(filename, lazy=False):   # Returns a setup function giving a freshly loaded tracker
+    def setup():
+        tracker = HabitTracker()
+        tracker.load_file(filename, lazy=lazy)
+        return tracker
+    return setup
+
+
+def lookup_all(tracker):   # Looks up every habit once, in random order
+    ids = [habit.id for habit in tracker.habits]
+    random.Random(0).shuffle(ids)
+    for habit_id in ids:
+        tracker.get_habit_by_id(habit_id)
+
+
+def hot_paths(filename, folder):   # (name, setup, run) of each measured operation
+    output = os.path.join(folder, 'saved.json')
+    return [
+        ('load_file', lambda: filename, lambda name: HabitTracker().load_file(name)),
+        ('load_file_lazy', lambda: filename, lambda name: HabitTracker().load_file(name, lazy=True)),
+        ('save_file', loaded(filename), lambda tracker: tracker.save_file(output)),
+        ('get_habit_by_id', loaded(filename), lookup_all),
+        ('calculate_streak', loaded(filename), lambda tracker: [habit.calculate_streak() for habit in tracker.habits]),
+        ('completion_rate', loaded(filename), lambda tracker: [analysis.completion_rate(habit) for habit in tracker.habits]),
+        ('longest_streak', loaded(filename), analysis.longest_streak),
+    ]
+
+
+def run(sizes, repeat=3):
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for habit_count, years in sizes:
+            filename = os.path.join(folder, f'habits_{habit_count}x{years}.json')
+            completions = write_habits_file(filename, habit_count, years)
+            for name, setup, operation in hot_paths(filename, folder):
+                result = measure(setup, operation, repeat)
+                result.update({'name': name, 'habits': habit_count, 'years': years, 'completions': completions,
+                    'file_bytes': os.path.getsize(filename)})
+                results.append(result)
+                print(f"{name:18} {habit_count:>7} habits x {years} years: {result['seconds'] * 1000:10.2f} ms, peak {result['peak_bytes'] / 1e6:8.2f} MB")
+    return results
+
+
+def parse_size(text):   # '1000x2' -> (1000, 2)
+    habits, _, years = text.partition('x')
+    return int(habits), int(years or 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the habit tracker hot paths")
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=[(100, 1), (1000, 2), (10000, 2)])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    write_results(args.output, 'hot_paths', results)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Helpers shared by the benchmarks: timing, peak memory and saving results as JSON.
+"""
+
+
+import contextlib
+import io
+import json
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+
+
+def measure(setup, run, repeat=3):
+    """
+    Times run(setup()) and measures its peak memory.
+    setup is called again before every run (and isn't measured), so each run starts
+    from the same state. Returns {'seconds': best time, 'peak_bytes': peak memory}.
+    Anything printed by run is hidden.
+    """
+
+    best = None
+    for _ in range(repeat):
+        state = setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            run(state)
+            seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+
+    state = setup()   # Memory is measured on a separate run because tracemalloc slows everything down
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        try:
+            run(state)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {'seconds': best, 'peak_bytes': peak}
+
+
+def write_results(filename, benchmark, results):   # Saves a list of result dicts with details about this machine
+    report = {
+        'benchmark': benchmark,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    with open(filename, 'w') as file:
+        json.dump(report, file, indent=2)
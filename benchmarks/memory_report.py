@@ -0,0 +1,110 @@
+"""
+Shows how much memory loaded habits take, per habit and per completion, with
+the original layout (a __dict__ per habit, a date object and a list of ISO
+strings) and with the current Habit (__slots__, ordinals in an array).
+Memory is measured with tracemalloc as what is still allocated once the
+habits are built from the JSON file.
+
+python -m benchmarks.memory_report [--habits 10000] [--years 2] [--output memory_report.json]
+"""
+
+
+import argparse
+import gc
+import json
+import os
+import tempfile
+import tracemalloc
+from datetime import date
+
+from benchmarks.generator import write_habits_file
+from benchmarks.measure import write_results
+from habit import Habit
+from lazy_loading import read_lazy_habits
+
+
+class OriginalHabit:   # The habit layout before __slots__ and ordinal arrays, for comparison
+    def __init__(self, id, name, periodicity, creation_date, completions):
+        self.id = id
+        self.name = name
+        self.periodicity = periodicity
+        self.creation_date = creation_date
+        self.completions = completions
+
+
+def original_habits(filename):
+    with open(filename) as file:
+        data = json.load(file)
+    return [OriginalHabit(item['id'], item['name'], item['periodicity'], date.fromisoformat(item['creation_date']), item['completions'])
+        for item in data['habits']]
+
+def current_habits(filename):
+    with open(filename) as file:
+        data = json.load(file)
+    return [Habit(item['id'], item['name'], item['periodicity'], date.fromisoformat(item['creation_date']), item['completions'])
+        for item in data['habits']]
+
+def lazy_habits(filename):   # Completions not read yet
+    return read_lazy_habits(filename)[0]
+
+
+LAYOUTS = [('original', original_habits), ('slots', current_habits), ('lazy, not loaded', lazy_habits)]
+
+
+def retained_bytes(build, filename):   # Memory still allocated by what build(filename) returns
+    gc.collect()
+    tracemalloc.start()
+    try:
+        kept = build(filename)
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return size
+
+
+def write_empty_habits(filename, habit_count):   # The same habits without completions
+    with open(filename) as file:
+        data = json.load(file)
+    for item in data['habits'][:habit_count]:
+        item['completions'] = []
+    with open(filename, 'w') as file:
+        json.dump(data, file, indent=2)
+
+
+def run(habit_count, years):
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        full_name = os.path.join(folder, 'habits.json')
+        empty_name = os.path.join(folder, 'empty.json')
+        completions = write_habits_file(full_name, habit_count, years)
+        write_habits_file(empty_name, habit_count, years)
+        write_empty_habits(empty_name, habit_count)
+
+        print(f"{habit_count} habits, {completions} completions")
+        for layout, build in LAYOUTS:
+            empty = retained_bytes(build, empty_name)
+            full = retained_bytes(build, full_name)
+            result = {'layout': layout, 'habits': habit_count, 'completions': completions, 'total_bytes': full,
+                'bytes_per_habit': empty / habit_count, 'bytes_per_completion': (full - empty) / completions}
+            results.append(result)
+            print(f"  {layout:<17} {full / 2 ** 20:8.1f} MiB  {result['bytes_per_habit']:6.0f} bytes/habit"
+                f"  {result['bytes_per_completion']:6.1f} bytes/completion")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory used by loaded habits")
+    parser.add_argument('--habits', type=int, default=10000)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--output', default='memory_report.json')
+    args = parser.parse_args()
+
+    results = run(args.habits, args.years)
+    write_results(args.output, 'memory_report', results)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
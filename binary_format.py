@@ -0,0 +1,161 @@
+"""
+This file saves habits in a compact binary file instead of JSON.
+A JSON file spends about 14 bytes on each completion ('"2025-09-03",' plus
+indentation); the binary file spends 4, and its completions can be read
+straight from the file without parsing anything.
+
+Layout (all numbers little-endian):
+- Header: b'HABITBIN', format (uint16), unused (uint16), number of habits (uint32), version (uint64)
+- Habit table, one entry per habit: id (uint32), periodicity (uint8: 0 daily, 1 weekly),
+  3 unused bytes, creation date ordinal (uint32), name offset (uint64), name length (uint32),
+  number of completions (uint32), completions offset (uint64)
+- Names (UTF-8)
+- Completions: one sorted uint32 array per habit, 4-byte aligned. Daily habits store
+  day ordinals (date.toordinal()), weekly habits week ordinals (see habit.week_ordinal).
+
+python binary_format.py to-binary habits.json habits.hbin
+python binary_format.py to-json habits.hbin habits.json
+"""
+
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+from atomic_file import write_atomically
+from habit import Habit
+from habit_tracker import HabitTracker
+
+
+MAGIC = b'HABITBIN'
+BINARY_FORMAT = 1
+HEADER = struct.Struct('<8sHHIQ')
+HABIT_ENTRY = struct.Struct('<IB3xIQIIQ')
+PERIODICITIES = ('daily', 'weekly')   # Position = the number stored in the habit table
+
+if array('i').itemsize != 4 or sys.byteorder != 'little':   # The completions are read straight into array('i')
+    raise ImportError("binary_format needs 4-byte ints on a little-endian machine")
+
+
+class BinarySnapshot:
+    """
+    A binary habits file mapped into memory
+    Attributes:
+    - version: version stamped in the file
+    - habit_count: number of habits
+    Nothing is decoded up front: ordinals(i) returns a view of the habit's completions
+    inside the file, so counting or searching them doesn't copy or parse anything.
+    """
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, file_format, _, self.habit_count, self.version = HEADER.unpack_from(self._view)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{filename} is not a binary habits file")
+        if file_format > BINARY_FORMAT:
+            self.close()
+            raise ValueError(f"{filename} was written by a newer version of the app")
+
+    def entry(self, index):   # (id, name, periodicity, creation date) of the habit at that position
+        habit_id, periodicity, creation, name_offset, name_length, _, _ = HABIT_ENTRY.unpack_from(self._view, HEADER.size + index * HABIT_ENTRY.size)
+        name = bytes(self._view[name_offset:name_offset + name_length]).decode('utf-8')
+        return habit_id, name, PERIODICITIES[periodicity], date.fromordinal(creation)
+
+    def _completion_bytes(self, index):   # The bytes of a habit's completions array, still inside the file
+        _, _, _, _, _, count, offset = HABIT_ENTRY.unpack_from(self._view, HEADER.size + index * HABIT_ENTRY.size)
+        return self._view[offset:offset + count * 4]
+
+    def ordinals(self, index):   # Completion ordinals of the habit at that position, as a read-only uint32 view into the file
+        return self._completion_bytes(index).cast('I')
+
+    def count_between(self, index, first, last):   # Completions with ordinals from first to last (both included), by binary search
+        ordinals = self.ordinals(index)
+        return bisect_right(ordinals, last) - bisect_left(ordinals, first)
+
+    def habits(self):   # Every habit as a Habit object (the completions are copied out of the file)
+        habits = []
+        for index in range(self.habit_count):
+            habit_id, name, periodicity, creation_date = self.entry(index)
+            ordinals = array('i')
+            ordinals.frombytes(self._completion_bytes(index))
+            habits.append(Habit.from_ordinals(habit_id, name, periodicity, creation_date, ordinals))
+        return habits
+
+    def close(self):   # Views handed out by ordinals() must be released first
+        self._view.release()
+        self._map.close()
+
+
+def pack_habits(habits, version=0):   # The binary file contents for a list of habits
+    names = [habit.name.encode('utf-8') for habit in habits]
+    name_offset = HEADER.size + HABIT_ENTRY.size * len(habits)
+    completions_offset = name_offset + sum(len(name) for name in names)
+    completions_offset += -completions_offset % 4   # Aligned, so cast('I') works on the mapped file
+
+    header = [HEADER.pack(MAGIC, BINARY_FORMAT, 0, len(habits), version)]
+    table, completions = [], []
+    for habit, name in zip(habits, names):
+        ordinals = habit.completion_ordinals()
+        table.append(HABIT_ENTRY.pack(habit.id, PERIODICITIES.index(habit.periodicity), habit.creation_date.toordinal(),
+            name_offset, len(name), len(ordinals), completions_offset))
+        completions.append(ordinals.tobytes())
+        name_offset += len(name)
+        completions_offset += len(ordinals) * 4
+
+    padding = b'\0' * (-name_offset % 4)
+    return b''.join(header + table + names + [padding] + completions)
+
+
+def write_binary(filename, habits, version=0):   # Writes the binary file, replacing the old one only once it is complete
+    with write_atomically(filename, 'wb') as file:
+        file.write(pack_habits(habits, version))
+
+
+def read_binary(filename):   # Returns (list of Habit, version) from a binary file
+    snapshot = BinarySnapshot(filename)
+    try:
+        return snapshot.habits(), snapshot.version
+    finally:
+        snapshot.close()
+
+
+def json_to_binary(json_file, binary_file):   # Converts a JSON habits file (and its log) into a binary file
+    tracker = HabitTracker()
+    tracker.load_file(json_file)
+    if tracker.source is None:
+        raise ValueError(f"{json_file} could not be loaded")
+    write_binary(binary_file, tracker.habits, tracker.version)
+    return len(tracker.habits)
+
+
+def binary_to_json(binary_file, json_file):   # Converts a binary file back into a JSON habits file
+    tracker = HabitTracker()
+    habits, version = read_binary(binary_file)
+    tracker.habits = habits
+    tracker.version = version - 1   # save_file stamps the next version
+    tracker.save_file(json_file)
+    return len(tracker.habits)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert habit files between JSON and the binary format")
+    parser.add_argument('direction', choices=['to-binary', 'to-json'])
+    parser.add_argument('source')
+    parser.add_argument('target')
+    args = parser.parse_args(argv)
+
+    convert = json_to_binary if args.direction == 'to-binary' else binary_to_json
+    count = convert(args.source, args.target)
+    print(f"{count} habits written to {args.target} ({os.path.getsize(args.target)} bytes).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+This file moves whole habit histories in and out of the app, one completion per row.
+Rows are read and written one by one with generators and applied in batches,
+so importing millions of rows from another tracker never needs them all in
+memory at once. Two layouts are supported:
+- CSV: name, periodicity, creation_date, date (one completion per line; an empty date
+  only creates the habit). Weekly completions are written as the Monday of their week.
+  A habit imported without a creation date is created on its earliest completion in
+  the first batch it appears in (today if it has none); completions before the day
+  (or week) a habit was created are reported as errors.
+- Columns: JSON lines, each one a chunk of rows stored column by column,
+  {"name": [...], "periodicity": [...], "creation_date": [...], "date": [...]},
+  which is smaller than one JSON object per row.
+"""
+
+
+import csv
+import itertools
+import json
+from datetime import date
+from functools import lru_cache
+
+from habit import week_ordinal, week_start
+
+
+CHUNK_SIZE = 10000   # Rows per batch when importing and per line when writing columns
+COLUMNS = ('name', 'periodicity', 'creation_date', 'date')
+PERIODICITIES = ('daily', 'weekly')
+MAX_ERRORS = 100   # Errors listed in the import summary (all of them are counted)
+
+
+def read_columns(stream):   # Yields (row number, dict) for each row of a columns file, or (line number, None) for a bad line
+    row_number = 0
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            chunk = json.loads(line)
+            names = chunk['name']
+            columns = [chunk.get(key) or [''] * len(names) for key in COLUMNS]
+            if any(len(column) != len(names) for column in columns):
+                raise ValueError("columns of different lengths")
+        except (ValueError, KeyError, TypeError, AttributeError):
+            yield line_number, None
+            continue
+        for values in zip(*columns):
+            row_number += 1
+            yield row_number, dict(zip(COLUMNS, values))
+
+
+@lru_cache(maxsize=65536)
+def parse_day(text):   # A date written as 2025-09-03 (newer Pythons would also take 2025-W36, which isn't a day)
+    if len(text) != 10 or text[4] != '-' or text[7] != '-':
+        raise ValueError(text)
+    return date.fromisoformat(text)
+
+
+def split_completions(rows):   # Yields JSON rows that hold a list of completions as one row per completion
+    for line, row in rows:
+        if row is not None and isinstance(row.get('completions'), list):
+            fields = {key: value for key, value in row.items() if key != 'completions'}
+            if not row['completions']:
+                yield line, fields
+            for value in row['completions']:
+                yield line, dict(fields, date=value)
+        else:
+            yield line, row
+
+
+def first_day(habit):   # Ordinal of the earliest day a habit can be completed on: its creation day, or the Monday of that week if weekly
+    if habit.periodicity == 'weekly':
+        return week_start(week_ordinal(habit.creation_date)).toordinal()
+    return habit.creation_date.toordinal()
+
+
+def check_batch(batch):
+    """
+    Validates a batch of (line, row) pairs and drops rows repeated inside the batch.
+    Returns (valid rows as (line, name, periodicity, creation date or None, completion date text or None),
+    errors as (line, message), number of repeated rows).
+    """
+
+    valid, errors = [], []
+    seen = set()   # (casefolded name, date) of the completions already in this batch
+    repeated = 0
+    for line, row in batch:
+        if row is None:
+            errors.append((line, "not a valid row"))
+            continue
+        name = str(row.get('name') or '').strip()
+        periodicity = str(row.get('periodicity') or '').strip().lower()
+        if not name:
+            errors.append((line, "row needs a name"))
+            continue
+        if periodicity not in PERIODICITIES:
+            errors.append((line, f"periodicity must be 'daily' or 'weekly', not {periodicity!r}"))
+            continue
+        try:
+            creation_date = parse_day(str(row['creation_date']).strip()) if row.get('creation_date') else None
+            day = str(row.get('date') or '').strip() or None
+            if day is not None:
+                parse_day(day)   # Only dates are accepted, not week keys
+        except (ValueError, TypeError):
+            errors.append((line, "dates must look like 2025-09-03"))
+            continue
+
+        if day is not None:
+            key = (name.casefold(), day)
+            if key in seen:
+                repeated += 1
+                continue
+            seen.add(key)
+        valid.append((line, name, periodicity, creation_date, day))
+    return valid, errors, repeated
+
+
+def import_rows(tracker, rows, save=None, batch_size=CHUNK_SIZE):
+    """
+    Adds the habits and completions of (line, row) pairs to a tracker, a batch at a time.
+    save (for example lambda: storage.save_changes(tracker)) is called once the rows
+    not saved yet are as many as the rows saved before them, and once at the end.
+    Saving rewrites the whole file, so this keeps the total work proportional to the
+    history instead of growing with the square of it, while the unsaved changes
+    never get bigger than what is already on disk.
+    Habits without a creation date are created on their earliest completion in the batch,
+    so the completion rate isn't worked out from the day of the import.
+    Returns the summary printed by the import command: rows read, completions added (changed),
+    duplicates (unchanged), habits created, the number of errors and the first MAX_ERRORS of them.
+    """
+
+    summary = {'command': 'import', 'rows': 0, 'changed': 0, 'unchanged': 0, 'habits_created': 0, 'error_count': 0, 'errors': []}
+    saved = unsaved = 0   # Rows applied before and since the last save
+    rows = split_completions(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        summary['rows'] += len(batch)
+        valid, errors, repeated = check_batch(batch)
+        summary['unchanged'] += repeated
+        first_days = {}   # casefolded name -> earliest completion in this batch, for habits created without a creation date
+        starts = {}   # habit id -> first_day of the habits seen in this batch
+        for line, name, periodicity, creation_date, day in valid:
+            if day is not None:
+                key = name.casefold()
+                first_days[key] = min(day, first_days.get(key, day))   # ISO dates sort as text
+
+        for line, name, periodicity, creation_date, day in valid:
+            habit = tracker.get_habit_by_name(name)
+            if habit is None:
+                if creation_date is None and name.casefold() in first_days:
+                    creation_date = parse_day(first_days[name.casefold()])
+                habit = tracker.insert_habit(name, periodicity, creation_date)
+                summary['habits_created'] += 1
+            elif habit.periodicity != periodicity:
+                errors.append((line, f"habit '{habit.name}' is {habit.periodicity}, not {periodicity}"))
+                continue
+            if day is None:
+                continue
+            start = starts.get(habit.id)
+            if start is None:
+                start = starts[habit.id] = first_day(habit)
+            if parse_day(day).toordinal() < start:
+                errors.append((line, f"{day} is before habit '{habit.name}' was created ({habit.creation_date.isoformat()})"))
+                continue
+            if tracker.add_completion(habit.id, day):
+                summary['changed'] += 1
+            else:
+                summary['unchanged'] += 1
+
+        summary['error_count'] += len(errors)
+        for line, message in sorted(errors)[:MAX_ERRORS - len(summary['errors'])]:
+            summary['errors'].append({'line': line, 'error': message})
+
+        unsaved += len(batch)
+        if save is not None and unsaved >= max(batch_size, saved):
+            save()
+            saved, unsaved = saved + unsaved, 0
+    if save is not None and unsaved:
+        save()
+    return summary
+
+
+def completion_rows(habits):
+    """
+    Yields one (name, periodicity, creation_date, date) tuple per completion, habit by habit,
+    or one with an empty date for a habit without completions (so it is exported too).
+    """
+
+    for habit in habits:
+        name, periodicity = habit.name, habit.periodicity
+        creation_date = habit.creation_date.isoformat()
+        ordinals = habit.completion_ordinals()
+        if not ordinals:
+            yield name, periodicity, creation_date, ''
+        for ordinal in ordinals:
+            day = week_start(ordinal) if periodicity == 'weekly' else date.fromordinal(ordinal)
+            yield name, periodicity, creation_date, day.isoformat()
+
+
+def write_csv(rows, stream):   # Writes row tuples as CSV with a header, returns the number of rows
+    writer = csv.writer(stream)
+    writer.writerow(COLUMNS)
+    count = 0
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, CHUNK_SIZE))
+        if not chunk:
+            return count
+        writer.writerows(chunk)
+        count += len(chunk)
+
+
+def write_columns(rows, stream, chunk_size=CHUNK_SIZE):   # Writes row tuples as column chunks, one JSON line per chunk, returns the number of rows
+    count = 0
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return count
+        stream.write(json.dumps(dict(zip(COLUMNS, map(list, zip(*chunk))))) + '\n')
+        count += len(chunk)
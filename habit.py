@@ -5,8 +5,96 @@ how often it should be done and when it was actually completed.
 It also figures out how long your current streak is for each habit.
 """
 
+from array import array   # Compact array of ints for the completion ordinals
+from bisect import bisect_left, bisect_right
 from datetime import date, timedelta 
 # Date to get current dates and timedelta to subtract days/weeks
+from functools import lru_cache   # Remembers conversions, the same dates/weeks appear in many habits
+import sys
+
+
+def week_ordinal(day):   # Number of the ISO week a date falls in, counted from 0001-01-01 (a Monday)
+    return (day.toordinal() - 1) // 7
+
+def week_start(week):   # Monday of the week returned by week_ordinal
+    return date.fromordinal(week * 7 + 1)
+
+def weeks_in_year(year):   # 52 or 53: December 28th is always in the last ISO week of its year
+    return date(year, 12, 28).isocalendar()[1]
+
+@lru_cache(maxsize=65536)
+def parse_completion(value, periodicity):
+    """
+    Converts a completion from the JSON file into an ordinal:
+    - For daily: the date ordinal of an ISO date ('2025-09-03')
+    - For weekly: the week ordinal of an ISO week key ('2025-W36') or of any date in that week
+    Older versions wrote weekly keys with the calendar year instead of the ISO year
+    ('2027-W53' for January 1st 2027, which is in week 53 of 2026). A week number
+    that doesn't exist in that year is therefore read as the last week of the year before.
+    Other old keys can mean two weeks ('2022-W52' was also written on January 1st 2022);
+    they are read as ISO weeks here, and migrate_week_keys picks one when a whole old file is read.
+    """
+
+    if periodicity == 'weekly':
+        if '-W' in value:
+            year, week = value.split('-W')
+            year, week = int(year), int(week)
+            if week > weeks_in_year(year):   # Old calendar year key from the first days of January
+                year -= 1
+            jan_4 = date(year, 1, 4)   # January 4th is always in ISO week 1
+            monday = jan_4 - timedelta(days=jan_4.weekday()) + timedelta(weeks=week - 1)
+            return week_ordinal(monday)
+        return week_ordinal(date.fromisoformat(value))
+    return date.fromisoformat(value).toordinal()
+
+def old_week_candidates(value):   # Week ordinals an old calendar-year week key can mean, earliest first
+    if '-W' not in value:
+        return [parse_completion(value, 'weekly')]
+    year, week = value.split('-W')
+    year, week = int(year), int(week)
+    first, last = date(year, 1, 1), date(year, 12, 31)
+    weeks = []
+    if tuple(first.isocalendar())[:2] == (year - 1, week):   # Written in the first days of January
+        weeks.append(week_ordinal(first))
+    if 1 <= week <= weeks_in_year(year):
+        weeks.append(week_ordinal(date.fromisocalendar(year, week, 1)))
+    if tuple(last.isocalendar())[:2] == (year + 1, week):   # Written in the last days of December
+        weeks.append(week_ordinal(last))
+    return weeks
+
+def migrate_week_keys(values, creation_date, today):
+    """
+    Converts the weekly completions of a habit saved before file format 2 into ISO week keys.
+    Those keys used the calendar year, so near New Year one key can mean two weeks:
+    '2022-W52' was written on January 1st 2022 (week 52 of 2021) and at the end of 2022,
+    '2024-W1' in the first week of 2024 and on December 30th/31st 2024 (week 1 of 2025).
+    The old app added each completion at the end of the list, so a key is read as the ISO week
+    (like parse_completion) unless that week is before the previous completion or the creation
+    week, or after the next completion or this week; then the other week it can mean is used.
+    A key that fits both ways, such as the only completion of a habit, stays the ISO week.
+    """
+
+    candidates = [old_week_candidates(value) for value in values]
+    previous = week_ordinal(creation_date)
+    weeks = []
+    for index, value in enumerate(values):
+        usual = parse_completion(value, 'weekly')
+        upper = week_ordinal(today)
+        if index + 1 < len(candidates) and candidates[index + 1]:
+            upper = min(upper, candidates[index + 1][-1])
+        fitting = [week for week in candidates[index] if previous <= week <= upper]
+        week = usual if usual in fitting or not fitting else fitting[-1]
+        weeks.append(week)
+        previous = max(previous, week)
+    return [format_completion(week, 'weekly') for week in weeks]
+
+@lru_cache(maxsize=65536)
+def format_completion(ordinal, periodicity):   # Converts an ordinal back into its JSON text ('2025-09-03' or '2025-W06')
+    if periodicity == 'weekly':
+        iso_year, iso_week, _ = week_start(ordinal).isocalendar()
+        return f"{iso_year}-W{iso_week:02d}"
+    return date.fromordinal(ordinal).isoformat()
+
 
 class Habit:
 
@@ -18,15 +106,30 @@ class Habit:
     - periodicity: str, frequency of the habit ('daily', 'weekly')
     - creation_date: date, date when the habit was created
     - completions: List[str], dates (ISO format) of each time the habit was completed
+    Completions are stored as a sorted array of ordinals (days for daily habits,
+    weeks for weekly ones), 4 bytes each, and looked up by binary search. The completions
+    list is built from them when it is read, so changing that list does not change the habit.
+    Habits use __slots__ and keep the creation date as an ordinal, so a loaded habit
+    takes about 300 bytes plus 4 bytes per completion (see benchmarks/memory_report.py).
+    Runs of consecutive days/weeks are kept as sorted (start, end) ordinals and
+    updated on each new completion, so the current streak, best streak ever and
+    the streak on any date don't need to walk back through the history.
     """
 
+    __slots__ = ('id', 'name', 'periodicity', '_creation', '_ordinals', '_run_starts', '_run_ends', '_best_run')
+
+    # Attributes holding the completions (LazyHabit fills them in when first used)
+    COMPLETION_ATTRIBUTES = ('_ordinals', '_run_starts', '_run_ends', '_best_run')
+
+    streak_cache_stats = {'hits': 0, 'misses': 0}   # Shared by all habits, see analysis.streak_cache_info
+
     def __init__(self, id, name, periodicity, creation_date=None, completions=None):
         # The constructor: runs automatically when you create a habit
         # self: the habit instance being created
 
         self.id = id
         self.name = name
-        self.periodicity = periodicity 
+        self.periodicity = sys.intern(periodicity)   # All habits share the same 'daily'/'weekly' string
 
         if creation_date is None:   # If no date is provided, uses today's date
             self.creation_date = date.today()
@@ -38,79 +141,215 @@ class Habit:
         else: 
             self.completions = completions
 
-    def complete_habit(self):
+    @classmethod
+    def from_ordinals(cls, id, name, periodicity, creation_date, ordinals):   # Builds a habit from a sorted array('i') of ordinals, without parsing text
+        habit = cls(id, name, periodicity, creation_date)
+        habit._ordinals = ordinals
+        return habit
+
+    @property
+    def creation_date(self):   # Kept as a day ordinal, which is smaller than a date object
+        return date.fromordinal(self._creation)
+
+    @creation_date.setter
+    def creation_date(self, creation_date):
+        self._creation = creation_date.toordinal()
+
+    @property
+    def completions(self):   # Completions as ISO text, oldest first (the format saved in the JSON file)
+        return [format_completion(ordinal, self.periodicity) for ordinal in self._ordinals]
+
+    @completions.setter
+    def completions(self, completions):   # Replaces all completions, ignoring duplicates
+        ordinals = sorted({parse_completion(value, self.periodicity) for value in completions})
+        self._ordinals = array('i', ordinals)   # Sorted ordinals
+        self._run_starts = None   # First ordinal of each run, None until the runs are first needed
+        self._run_ends = None   # Last ordinal of each run
+        self._best_run = 0   # Length of the longest run
+
+    @property
+    def completion_count(self):   # Number of completed days/weeks
+        return len(self._ordinals)
+
+    def completion_ordinals(self):   # Sorted day/week ordinals of the completions (read only, don't change it)
+        return self._ordinals
+
+    def current_ordinal(self, today):   # Ordinal of the day/week that a date belongs to
+        if self.periodicity == 'weekly':
+            return week_ordinal(today)
+        return today.toordinal()
+
+    def _add_ordinal(self, ordinal):   # Adds a completion ordinal, keeping the array sorted. Returns False if it was already there
+
+        ordinals = self._ordinals
+        if not ordinals or ordinal > ordinals[-1]:   # Usual case: the newest completion goes at the end
+            ordinals.append(ordinal)
+        else:
+            position = bisect_left(ordinals, ordinal)
+            if position < len(ordinals) and ordinals[position] == ordinal:
+                return False
+            ordinals.insert(position, ordinal)
+
+        if self._run_starts is not None:   # Keep the runs up to date once they exist
+            self._add_to_runs(ordinal)
+        return True
+
+    def _add_to_runs(self, ordinal):   # Extends, joins or creates runs for a new completion
+
+        starts, ends = self._run_starts, self._run_ends
+        position = bisect_right(starts, ordinal)   # Runs before this position start before the ordinal
+        joins_previous = position > 0 and ends[position - 1] == ordinal - 1
+        joins_next = position < len(starts) and starts[position] == ordinal + 1
+
+        if joins_previous and joins_next:   # Fills the gap between two runs
+            ends[position - 1] = ends[position]
+            del starts[position]
+            del ends[position]
+            position -= 1
+        elif joins_previous:
+            ends[position - 1] = ordinal
+            position -= 1
+        elif joins_next:
+            starts[position] = ordinal
+        else:   # A run of its own
+            starts.insert(position, ordinal)
+            ends.insert(position, ordinal)
+
+        self._best_run = max(self._best_run, ends[position] - starts[position] + 1)
+
+    def _runs(self):   # Returns (starts, ends) of the runs, working them out the first time
+
+        if self._run_starts is not None:
+            Habit.streak_cache_stats['hits'] += 1
+            return self._run_starts, self._run_ends
+        
+        Habit.streak_cache_stats['misses'] += 1
+        starts, ends = array('i'), array('i')
+        for ordinal in self._ordinals:   # One pass, then keep them updated in _add_ordinal
+            if ends and ordinal == ends[-1] + 1:
+                ends[-1] = ordinal
+            else:
+                starts.append(ordinal)
+                ends.append(ordinal)
+        self._run_starts, self._run_ends = starts, ends
+        self._best_run = max((end - start + 1 for start, end in zip(starts, ends)), default=0)
+        return starts, ends
+
+    @property
+    def run_count(self):   # Number of separate runs of consecutive days/weeks
+        return len(self._runs()[0])
+
+    def runs(self):   # Runs as a list of (first date, last date); weekly runs use the Monday of each week
+        starts, ends = self._runs()
+        if self.periodicity == 'weekly':
+            return [(week_start(start), week_start(end)) for start, end in zip(starts, ends)]
+        return [(date.fromordinal(start), date.fromordinal(end)) for start, end in zip(starts, ends)]
+
+    def best_streak(self):   # Longest streak the habit ever had
+        self._runs()
+        return self._best_run
+
+    def streak_on(self, day):   # Streak the habit had on a given date, counting back from that day/week
+
+        starts, ends = self._runs()
+        current = self.current_ordinal(day)
+        position = bisect_right(starts, current) - 1   # Last run starting on or before that day/week
+
+        if position >= 0 and ends[position] >= current:
+            return current - starts[position] + 1
+        return 0
+
+    def count_between(self, first_day, last_day):   # Completions from first_day to last_day, both included (whole weeks for weekly habits), by binary search
+        ordinals = self._ordinals
+        return bisect_right(ordinals, self.current_ordinal(last_day)) - bisect_left(ordinals, self.current_ordinal(first_day))
+
+    def ordinals_between(self, first_day, last_day):   # The completion ordinals in the same range, as a new array
+        ordinals = self._ordinals
+        return ordinals[bisect_left(ordinals, self.current_ordinal(first_day)):bisect_right(ordinals, self.current_ordinal(last_day))]
+
+    def add_completion(self, value):   # Adds a completion given as JSON text, without printing. Returns True if it was new
+        return self._add_ordinal(parse_completion(value, self.periodicity))
+
+    def complete_habit(self, on=None):
 
         """
         Marks the habit as completed:
         - If 'daily', adds today's date.
-        - If 'weekly', adds the current week's Monday date. 
+        - If 'weekly', adds the current ISO week. 
         Prevents duplicates if already marked today/this week.
+        on: the date to complete it for instead of today (for example to fill in a missed day).
+        Returns the added completion as JSON text, or None if nothing was added.
         """
 
-        today = date.today()   # Gets today's date, storing it in the variable today
+        today = date.today() if on is None else on   # The day being completed, storing it in the variable today
 
-        if self.periodicity == 'daily':
+        if self.periodicity not in ('daily', 'weekly'):
+            print("Invalid periodicity. Use 'daily' or 'weekly', please.")
+            return None
 
-            today_str = today.isoformat()
+        ordinal = self.current_ordinal(today)
+        completion = format_completion(ordinal, self.periodicity)
+        is_today = on is None or ordinal == self.current_ordinal(date.today())   # Messages say 'today'/'this week' instead of the date
 
-            if today_str in self.completions:   # If today's date is already in completions, doesn't add it
-                print("Today's habit already completed.")
-            else:   # If not present, adds it
-                self.completions.append(today_str)
-                print(f"Habit '{self.name}' marked as completed for today!")
-        
-        elif self.periodicity == 'weekly':
-       
-            year_week = f"{today.year}-W{today.isocalendar()[1]}"   # Gets current year and week in 'YYYY-Www' format (for example, '2023-W14' for week 14 of 2023)
-    
-            if year_week in self.completions:   # If current week is already in completions, doesn't add it
-                print("This week's habit already completed.")
-            else:   # If not present, adds it
-                self.completions.append(year_week)    
-                print(f"Habit '{self.name}' marked as completed for this week!")
+        if self.periodicity == 'daily':
+
+            if not self._add_ordinal(ordinal):   # If today is already completed, doesn't add it
+                print("Today's habit already completed." if is_today else f"Habit already completed for {completion}.")
+                return None
+            print(f"Habit '{self.name}' marked as completed for {'today' if is_today else completion}!")
         
         else:
-            print("Invalid periodicity. Use 'daily' or 'weekly', please.")
+    
+            if not self._add_ordinal(ordinal):   # If current week is already completed, doesn't add it
+                print("This week's habit already completed." if is_today else f"Habit already completed for {completion}.")
+                return None
+            print(f"Habit '{self.name}' marked as completed for {'this week' if is_today else completion}!")
 
-    def calculate_streak(self):
+        return completion
+
+    def calculate_streak(self, as_of=None):
 
         """
         Calculates the current (consecutive) streak of the habit:
         - For daily: counts back from today until a break is found
         - For weekly: counts back from current week until a break is found
         Returns the streak count as an integer.
+        The runs are checked against today's date on every call,
+        so the streak drops to 0 when the day/week rolls over without a completion.
+        as_of: work out the streak as it was (or will be) on that date instead of today.
         """
 
-        if not self.completions:   # If there are no completions, streak is 0
+        if not self._ordinals:   # If there are no completions, streak is 0
             return 0
         
-        streak = 0   # Streak counter
-        today = date.today()   # Today's date
-        
-        if self.periodicity == 'daily':
-            current_date = today
-            while True:   # Count consecutive days backwards from today
-                date_str = current_date.isoformat()   # Converts current date to ISO text
-                if date_str in self.completions:   # If current date is in completions
-                    streak += 1   # Increase streak by 1
-                    current_date = current_date - timedelta(days=1)   # Subtract one day from current date
-                
-                else:
-                    break   # Breaks the loop when it finds a day not completed
-        
-        elif self.periodicity == 'weekly':
-            current_date = today
-            
-            while True:   # Count consecutive weeks backwards from current week
-                year_week = f"{current_date.year}-W{current_date.isocalendar()[1]}"   # Gets current year and week in 'YYYY-Www' format
-
-                if year_week in self.completions:
-                    streak += 1
-                    current_date = current_date - timedelta(weeks=1)   # Subtract one week from current date
-                
-                else:
-                    break
-        
-        return streak   
+        if as_of is None:
+            as_of = date.today()
+        current = self.current_ordinal(as_of)   # Today's day/week ordinal
+        starts, ends = self._runs()
+
+        if ends[-1] == current:   # Completed today/this week: the streak is the latest run
+            return ends[-1] - starts[-1] + 1
+        if ends[-1] < current:   # Not completed today/this week: no current streak
+            return 0
+        return self.streak_on(as_of)   # Completions after that date
+
+    def streak_timeline(self, first_day, last_day):
+        """
+        Streak on every day from first_day to last_day (both included), as a list of ints.
+        Walks through the days and the runs together once, instead of
+        searching the runs again for each day like streak_on.
+        """
 
-            
+        starts, ends = self._runs()
+        day_count = (last_day - first_day).days + 1
+        position = bisect_right(starts, self.current_ordinal(first_day)) - 1   # Last run starting on or before the first day
+        timeline = []
+        for offset in range(max(day_count, 0)):
+            current = self.current_ordinal(first_day + timedelta(days=offset))
+            while position + 1 < len(starts) and starts[position + 1] <= current:   # Moves on to the run this day is in (or after)
+                position += 1
+            if position >= 0 and ends[position] >= current:
+                timeline.append(current - starts[position] + 1)
+            else:
+                timeline.append(0)
+        return timeline
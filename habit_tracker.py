@@ -7,28 +7,99 @@ like adding new habits or deleting old ones.
 
 
 import json
+import os
+import re
 from datetime import date
-from habit import Habit
+from atomic_file import write_atomically
+from habit import Habit, format_completion, migrate_week_keys, parse_completion
+from lazy_loading import read_lazy_habits
+from locking import file_lock
+
+FILE_FORMAT = 2   # Version 2 writes weekly completions as zero-padded ISO weeks ('2025-W06')
 
 class HabitTracker:
     """
     The main controller that manages all habits in the app
     Attributes:
     - habits: list of Habit objects being tracked
+    Habits are kept in dictionaries indexed by ID and by name, so finding,
+    adding and deleting a habit does not need to go through the whole list.
+    Changes are remembered as operations (insert, delete, complete) so that
+    save_changes only has to append them to a log file next to the JSON file.
+    Every saved change raises the version stamped in the files, so a tracker can
+    tell when another process saved something and merge it before saving.
+    clock: function returning today's date (date.today unless another one is given,
+    for example to replay old data or to test what happens on a later day).
+    listeners: functions called with each change (the operation dict, or {'op': 'reload'}
+    when every habit was replaced), for caches that need to forget a habit when it changes.
+    They are also called with {'op': 'synced', 'file': ...} when the habits match that file
+    again (after loading or saving), which caches use to tell which state of the file they match.
     """
 
-    def __init__(self):
-        self.habits = []   # List of Habit objects
+    LOG_COMPACT_SIZE = 1000   # After this many logged operations the log is folded into the JSON file
+    READ_ATTEMPTS = 5   # Times a file rewritten by another process while being read is read again
 
-    def insert_habit(self, name, periodicity):   # Creates a new habit and adds it to the tracker
+    def __init__(self, clock=None):
+        self.clock = date.today if clock is None else clock
+        self.listeners = []   # Called with every change, see _changed
+        self._pending = []   # Operations not saved yet
+        self.source = None   # File (or database) that the saved habits match
+        self._log_size = 0   # Number of operations in the log of that JSON file
+        self._log_offset = 0   # How far into that log has been read (bytes)
+        self.version = 0   # Version of the last change read or saved
+        self._snapshot_version = 0   # Version stamped at the start of the JSON file the log belongs to (see snapshot_version)
+        self._needs_rewrite = False   # True when the JSON file is in an older format
+        self._habits_by_id = {}   # id -> Habit, keeps insertion order for listing
+        self._habits_by_name = {}   # casefolded name -> list of Habits with that name
+        self._next_id = 1   # Monotonic counter for new habit IDs
 
-        if self.habits:
-            new_id = max(habit.id for habit in self.habits) + 1   # Finds the highest existing ID and increments it by 1
-        else:
-            new_id = 1
+    @property
+    def habits(self):   # List of Habit objects, in the order they were added
+        return list(self._habits_by_id.values())
+
+    @habits.setter
+    def habits(self, habits):   # Replaces every habit and rebuilds the indexes
+        self._habits_by_id = {}
+        self._habits_by_name = {}
+        self._next_id = 1
+        for habit in habits:
+            self._add_to_index(habit)
+        self._changed({'op': 'reload'})
+
+    def _record(self, operation):   # Remembers a change made here for saving
+        self._pending.append(operation)
+        self._changed(operation)
+
+    def _changed(self, operation):   # Tells the listeners about a change made here or read from the log
+        for listener in self.listeners:
+            listener(operation)
+
+    def synced(self, source):   # Tells the listeners that the habits now match the saved file (or database) source
+        self._changed({'op': 'synced', 'file': source})
+
+    def _add_to_index(self, habit):   # Registers a habit in the id and name indexes
+        self._habits_by_id[habit.id] = habit
+        self._habits_by_name.setdefault(habit.name.casefold(), []).append(habit)
+        if habit.id >= self._next_id:   # Never hand out an ID that is already used
+            self._next_id = habit.id + 1
+
+    def _remove_from_index(self, habit):   # Removes a habit from the id and name indexes
+        del self._habits_by_id[habit.id]
+        key = habit.name.casefold()
+        same_name = self._habits_by_name[key]
+        same_name.remove(habit)   # Usually a list of one habit
+        if not same_name:
+            del self._habits_by_name[key]
+
+    def insert_habit(self, name, periodicity, creation_date=None):   # Creates a new habit (created today unless a date is given) and adds it to the tracker
 
-        new_habit = Habit(new_id, name, periodicity)   
-        self.habits.append(new_habit)   # Adds the new habit to the list
+        new_id = self._next_id   # IDs only go up, and the JSON file saves the counter, so a deleted habit's ID isn't reused (the SQLite and binary storages go on from the highest saved ID)
+
+        if creation_date is None:
+            creation_date = self.clock()
+        new_habit = Habit(new_id, name, periodicity, creation_date)   
+        self._add_to_index(new_habit)   # Adds the new habit to the indexes
+        self._record({'op': 'insert', 'id': new_id, 'name': name, 'periodicity': periodicity, 'creation_date': new_habit.creation_date.isoformat()})
         print(f"Habit '{name}' added with ID {new_id}.") 
         return new_habit 
    
@@ -36,61 +107,352 @@ class HabitTracker:
 
         habit = self.get_habit_by_id(habit_id)   # Find the habit by ID
         if habit:
-            self.habits.remove(habit)   # Remove the habit from the list
+            self._remove_from_index(habit)   # Remove the habit from the indexes
+            self._record({'op': 'delete', 'id': habit_id})
             print(f"Habit with ID {habit_id} deleted.")
             return True
         print(f"Habit with ID {habit_id} not found.") 
         return False
     
     def get_habit_by_id(self, habit_id):   # Finds and returns a habit by its ID
-        for habit in self.habits:
-            if habit.id == habit_id:
-                return habit
-        return None
+        return self._habits_by_id.get(habit_id)
     
-    def get_habit_by_name(self, name):   # Finds and returns a habit by its name
-        for habit in self.habits:
-            if habit.name.lower() == name.lower():
-                return habit
+    def get_habit_by_name(self, name):   # Finds and returns a habit by its name (case-insensitive)
+        same_name = self._habits_by_name.get(name.casefold())
+        if same_name:
+            return same_name[0]   # The first habit added with this name
         return None
     
-    def save_file(self, filename):   # Saves all habits to a JSON file
+    def has_changes(self):   # True when something changed since the last load/save
+        return bool(self._pending) or self._needs_rewrite
+
+    def take_changes(self):   # Returns the operations not saved yet and forgets them (used by the storages)
+        changes = self._pending
+        self._pending = []
+        return changes
+
+    def pending_changes(self):   # The operations not saved yet, oldest first, for a storage that saves them one at a time
+        return list(self._pending)
+
+    def forget_changes(self, count):   # Forgets the first count pending operations, once a storage has saved them
+        del self._pending[:count]
+
+    @property
+    def next_id(self):   # ID the next new habit will get (higher than every ID in the tracker)
+        return self._next_id
+
+    def renumber_habit(self, habit_id, new_id):   # Gives a habit the ID a storage had to pick for it, and tells the listeners
+        for operation in self._pending:   # The changes not saved yet now refer to the new ID (IDs are never reused here)
+            if operation['id'] == habit_id:
+                operation['id'] = new_id
+        habit = self.get_habit_by_id(habit_id)
+        if habit is None:   # Deleted before it was saved
+            return
+        self._remove_from_index(habit)
+        habit.id = new_id
+        self._add_to_index(habit)
+        print(f"Habit '{habit.name}' now has ID {habit.id}.")
+        self._changed({'op': 'delete', 'id': habit_id})
+        self._changed({'op': 'insert', 'id': new_id, 'name': habit.name, 'periodicity': habit.periodicity,
+            'creation_date': habit.creation_date.isoformat()})
+
+    def complete_habit(self, habit_id, on=None):   # Marks a habit as completed (today, or on a given date) and remembers the change for saving
+        habit = self.get_habit_by_id(habit_id)
+        if habit is None:
+            return False
+        completion = habit.complete_habit(self.clock() if on is None else on)
+        if completion:   # Only new completions need to be saved
+            self._record({'op': 'complete', 'id': habit_id, 'completion': completion})
+        return True
+
+    def add_completion(self, habit_id, value):   # Adds a completion for any date/week (JSON text), returns True if it was new
+        habit = self.get_habit_by_id(habit_id)
+        if habit is None or not habit.add_completion(value):
+            return False
+        completion = format_completion(parse_completion(value, habit.periodicity), habit.periodicity)   # Saved in the usual format
+        self._record({'op': 'complete', 'id': habit_id, 'completion': completion})
+        return True
+    
+    def save_file(self, filename):   # Saves all habits to a JSON file (a full snapshot)
+        try:
+            with file_lock(filename):
+                if filename == self.source:   # Keep what other processes saved in the meantime
+                    self._sync(filename)
+                    version = self.version + 1
+                else:   # Replaces the file, but its version still has to go up for the other processes
+                    version = max(self.version, disk_version(filename)) + 1
+                self._write_snapshot(filename, version)
+            print(f"Habits saved to {filename}.")
+        
+        except Exception:   # Catches any exception that occurs during file operations
+            print("Error saving habits to file.")
+
+    def _write_snapshot(self, filename, version):   # Writes every habit to the JSON file (the lock must be held)
         habits_data = []
         for habit in self.habits:
             habit_dict = {'id': habit.id, 'name': habit.name, 'periodicity': habit.periodicity, 'creation_date': habit.creation_date.isoformat(), 'completions': habit.completions}
             habits_data.append(habit_dict) 
 
+        with write_atomically(filename) as file:   # The JSON file is never left half written
+            json.dump({'version': version, 'format': FILE_FORMAT, 'next_id': self._next_id, 'habits': habits_data}, file, indent=2)   # Version first, see snapshot_version
+
+        if os.path.exists(log_name(filename)):   # The snapshot now holds everything in the log
+            os.remove(log_name(filename))
+        self._pending = []
+        self.source = filename
+        self.version = version
+        self._snapshot_version = version
+        self._log_size = 0
+        self._log_offset = 0
+        self._needs_rewrite = False
+        self.synced(filename)   # The lock is still held, so nothing else has changed the file yet
+
+    def save_changes(self, filename):
+        """
+        Saves only what changed since the last load/save by appending it to the
+        log file (filename + '.log'). The whole JSON file is rewritten instead
+        when the habits came from a different file or the log has grown too long.
+        Changes saved by other processes since then are merged in first.
+        """
+
+        if filename != self.source:
+            self.save_file(filename)
+            return
+        if not self._pending and not self._needs_rewrite:
+            return
+
         try:
-            file = open(filename, 'w')   # Opens the file to write
-            json.dump({'habits': habits_data}, file, indent=2)
-            file.close()   # Close the file after writing
-            print(f"Habits saved to {filename}.")
+            with file_lock(filename):
+                self._sync(filename)
+                if self._needs_rewrite or self._log_size + len(self._pending) > self.LOG_COMPACT_SIZE:
+                    self._write_snapshot(filename, self.version + 1)
+                    print(f"Habits saved to {filename}.")
+                    return
+
+                lines = []
+                for operation in self._pending:
+                    self.version += 1
+                    operation['version'] = self.version   # Each saved change gets the next version
+                    lines.append(json.dumps(operation) + '\n')   # One operation per line
+
+                file = open(log_name(filename), 'a+b')   # Opens the log to add lines at the end
+                with file:
+                    if file.tell() > 0:
+                        file.seek(-1, os.SEEK_END)
+                        if file.read(1) != b'\n':   # A line cut short by a crash: end it so ours start on a new line
+                            file.write(b'\n')
+                    file.write(''.join(lines).encode('utf-8'))
+                    file.flush()
+                    os.fsync(file.fileno())
+                    self._log_offset = file.tell()
+                self._log_size += len(self._pending)
+                self._pending = []
+                self.synced(filename)
         
-        except Exception:   # Catches any exception that occurs during file operations
+        except Exception:
             print("Error saving habits to file.")
+
+    def _sync(self, filename):
+        """
+        Brings in the changes other processes saved since this tracker last read
+        or wrote the file (the lock must be held). The changes not saved yet are
+        applied again on top; completions just add up, and a new habit whose ID
+        was taken in the meantime gets the next free ID.
+        """
+
+        pending = self._pending
+        inserted = {}   # Habits added here and not saved yet, taken out while the other changes go in
+        for operation in pending:
+            if operation['op'] == 'insert':
+                habit = self.get_habit_by_id(operation['id'])
+                inserted[operation['id']] = habit
+                if habit is not None:
+                    self._remove_from_index(habit)
+
+        if snapshot_version(filename) != self._snapshot_version:   # Someone rewrote the JSON file: read it all again
+            self._read_all(filename, lazy=False)
+            taken = set(self._habits_by_id)
+        else:
+            taken = self._replay_log(filename, self._log_offset)
+
+        renumbered = {}   # Old ID -> new ID of the habits that had to move
+        for operation in pending:
+            if operation['op'] == 'insert':
+                habit = inserted[operation['id']]
+                if habit is None:   # Added and deleted again before saving
+                    habit = Habit(operation['id'], operation['name'], operation['periodicity'], date.fromisoformat(operation['creation_date']))
+                moved = habit.id in taken or habit.id in self._habits_by_id
+                if moved:
+                    habit.id = self._next_id
+                    renumbered[operation['id']] = habit.id
+                    print(f"Habit '{habit.name}' now has ID {habit.id}.")
+                operation['id'] = habit.id
+                self._add_to_index(habit)
+                if moved:
+                    self._changed(operation)   # Listeners only knew this habit under its old ID
+            else:
+                operation['id'] = renumbered.get(operation['id'], operation['id'])
+                self._apply(operation)
+        self._pending = pending
         
-    def load_file(self, filename):   # Loads habits from a JSON file
+    def load_file(self, filename, lazy=False):
+        """
+        Loads habits from a JSON file and replays its log.
+        With lazy=True only the habit details are read now; each habit reads
+        its completions from the file the first time they are needed.
+        Files written before FILE_FORMAT 2 are rewritten in the new format on the next save.
+        """
+
+        try:
+            file_format = self._read_all(filename, lazy)
+            self._pending = []
+            self.source = filename
+            self._needs_rewrite = file_format < FILE_FORMAT   # Old week keys: the next save_changes writes the whole file again
+            self.synced(filename)
+        
+        except Exception:   
+            print("Error loading habits from file.")
+            self.habits = []
+            self._pending = []
+            self.source = None
+            self._needs_rewrite = False
+            self.version = 0
+            self._snapshot_version = 0
+            self._log_size = 0
+            self._log_offset = 0
+
+    def _read_all(self, filename, lazy):
+        """
+        Reads the JSON file and its log, returns the file format.
+        If another process rewrites the file while it is being read, reads it again.
+        """
+
+        for attempt in range(self.READ_ATTEMPTS):
+            stamp = snapshot_version(filename)   # Compared with the same stamp after reading, to see if the file was replaced
+            loaded = None
+            if lazy:
+                try:
+                    loaded = read_lazy_habits(filename)   # None if the file can't be read this way
+                except FileNotFoundError:
+                    loaded = ([], {})
+
+            if loaded is None:
+                loaded = self._read_habits(filename)
+
+            habits, header = loaded
+            self.habits = habits   # Rebuilds the ID and name indexes
+            self._next_id = max(self._next_id, header.get('next_id', 1))   # Also counts habits deleted before the snapshot
+            self.version = header.get('version', 0)
+            self._snapshot_version = stamp
+            self._log_size = 0
+            self._log_offset = 0
+            self._replay_log(filename, 0)
+            if snapshot_version(filename) == stamp:   # The log belongs to the snapshot just read
+                break
+        return header.get('format', 1 if habits else FILE_FORMAT)   # After READ_ATTEMPTS rewrites in a row, keeps the last read
+
+    def _read_habits(self, filename):   # Reads every habit and its completions from a JSON file, returns (habits, other top-level keys)
         try:
             file = open(filename, 'r')  # Opens the file to read
             data = json.load(file)
             file.close()  # Closes the file after reading
+        except FileNotFoundError:
+            return [], {}   # If file not found, start with an empty list (the log may still have habits)
 
-            self.habits = []  # Temporary list to hold loaded habits
+        habits = []  # Temporary list to hold loaded habits
+        old_weeks = data.get('format', 1) < FILE_FORMAT   # Week keys with the calendar year, see migrate_week_keys
 
-            for habit_data in data.get('habits', []):
-                creation_date = date.fromisoformat(habit_data['creation_date']) 
-                habit = Habit(habit_data['id'], habit_data['name'], habit_data['periodicity'], creation_date, habit_data['completions']) 
-                self.habits.append(habit)  # Add the loaded habit to the list            
+        for habit_data in data.pop('habits', []):
+            creation_date = date.fromisoformat(habit_data['creation_date']) 
+            completions = habit_data['completions']
+            if old_weeks and habit_data['periodicity'] == 'weekly':
+                completions = migrate_week_keys(completions, creation_date, self.clock())
+            habit = Habit(habit_data['id'], habit_data['name'], habit_data['periodicity'], creation_date, completions) 
+            habits.append(habit)  # Add the loaded habit to the list            
+        return habits, data
 
+    def _replay_log(self, filename, offset):
+        """
+        Applies the operations in the log file from a byte offset on.
+        Returns the IDs of the habits those operations inserted.
+        """
+
+        try:
+            file = open(log_name(filename), 'rb')
         except FileNotFoundError:
-            self.habits = []   # If file not found, start with an empty list
-        
-        except Exception:   
-            print("Error loading habits from file.")
-            self.habits = []
+            return set()
+
+        inserted = set()
+        with file:
+            file.seek(offset)
+            for line in file:
+                if not line.endswith(b'\n'):   # Still being written (or cut short by a crash): read it next time
+                    break
+                offset += len(line)
+                try:
+                    operation = json.loads(line)
+                except ValueError:   # A line cut short by a crash while saving: ignore it
+                    continue
+                self._apply(operation)
+                self.version = max(self.version, operation.get('version', 0))
+                self._log_size += 1
+                if operation['op'] == 'insert':
+                    inserted.add(operation['id'])
+        self._log_offset = offset
+        return inserted
+
+    def _apply(self, operation):   # Applies one logged operation (applying it twice changes nothing)
+        habit = self.get_habit_by_id(operation['id'])
+
+        if operation['op'] == 'insert' and habit is None:
+            creation_date = date.fromisoformat(operation['creation_date'])
+            self._add_to_index(Habit(operation['id'], operation['name'], operation['periodicity'], creation_date))
+        elif operation['op'] == 'delete' and habit is not None:
+            self._remove_from_index(habit)
+        elif operation['op'] == 'complete' and habit is not None:
+            habit.add_completion(operation['completion'])
+        self._changed(operation)
 
     def list_all_habits(self):   # Returns a list of all habits
         return self.habits
+
+
+SNAPSHOT_VERSION = re.compile(rb'^\s*\{\s*"version"\s*:\s*(\d+)')   # save_file writes the version first
+
+def snapshot_version(filename):   # Version stamped at the start of a JSON file (0 if it has none or doesn't exist)
+    try:
+        with open(filename, 'rb') as file:
+            match = SNAPSHOT_VERSION.match(file.read(64))
+    except FileNotFoundError:
+        return 0
+    return int(match.group(1)) if match else 0
+
+def disk_version(filename):   # Latest version saved in a JSON file and its log, without reading the habits
+    version = snapshot_version(filename)
+    try:
+        file = open(log_name(filename), 'rb')
+    except FileNotFoundError:
+        return version
+    with file:   # Versions only go up, so the last complete line of the log has the latest one
+        size = file.seek(0, os.SEEK_END)
+        window = 4096
+        while True:
+            start = max(0, size - window)
+            file.seek(start)
+            lines = file.read(size - start).split(b'\n')[:-1]   # The last piece is empty or still being written
+            if start > 0:
+                lines = lines[1:]   # May start in the middle of a line
+            for line in reversed(lines):
+                try:
+                    return max(version, json.loads(line).get('version', 0))
+                except (ValueError, AttributeError):   # A line cut short by a crash
+                    continue
+            if start == 0:
+                return version
+            window *= 4
+
+def log_name(filename):   # Name of the operation log kept next to a JSON file
+    return filename + '.log'
     
 
         
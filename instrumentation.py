@@ -0,0 +1,196 @@
+"""
+This file measures where the app spends its time, when asked to.
+enable() swaps the hot functions (loading, saving, streaks, completion rates
+and the menu actions that use them) for versions that count the calls, time
+them and count the bytes read and written. disable() puts the originals back,
+so when it is off nothing is measured and nothing is slower.
+
+Run the menu with HABIT_TRACKER_STATS=1 to turn it on, and type 'stats' in the
+main menu to see the numbers. HABIT_TRACKER_STATS=stats.json also saves them to
+that file on exit, and HABIT_TRACKER_PROFILE=run.prof runs the whole app under
+cProfile and saves its profile.
+"""
+
+
+import cProfile
+import functools
+import json
+import os
+import pstats
+import random
+import time
+
+import analysis
+from habit import Habit
+from habit_tracker import HabitTracker, log_name
+
+
+SAMPLE_LIMIT = 10000   # Latencies kept per function for the percentiles (a random sample once there are more calls)
+
+_stats = {}   # name -> dict with calls, total_ns, samples, bytes_read, bytes_written
+_originals = []   # (owner, attribute, original) of everything swapped, to put back in disable()
+_counting = []   # Names of the measured functions counting bytes right now (only the outermost one counts)
+
+
+def file_size(filename):   # Size of a file, 0 if it doesn't exist
+    try:
+        return os.path.getsize(filename)
+    except OSError:
+        return 0
+
+def file_state(filename):   # What changes when a file is replaced or written to
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class LoadBytes:   # Counts the JSON file and its log as read
+    def before(self, tracker, filename, *args, **kwargs):
+        return None
+
+    def after(self, state, tracker, filename, *args, **kwargs):
+        return file_size(filename) + file_size(log_name(filename)), 0
+
+class SaveBytes:   # Counts the JSON file as written if it was replaced, plus what was added to the log
+    def before(self, tracker, filename, *args, **kwargs):
+        return file_state(filename), file_size(log_name(filename))
+
+    def after(self, state, tracker, filename, *args, **kwargs):
+        old_file, old_log = state
+        written = 0
+        if file_state(filename) != old_file:
+            written += file_size(filename)
+        new_log = file_size(log_name(filename))
+        if new_log > old_log:
+            written += new_log - old_log
+        return 0, written
+
+
+def hot_paths():   # (owner, attribute, byte counter or None) of everything enable() measures
+    return [
+        (HabitTracker, 'load_file', LoadBytes()),
+        (HabitTracker, 'save_file', SaveBytes()),
+        (HabitTracker, 'save_changes', SaveBytes()),
+        (Habit, 'calculate_streak', None),
+        (Habit, 'best_streak', None),
+        (analysis, 'current_streak', None),
+        (analysis, 'completion_rate', None),
+        (analysis, 'longest_streak', None),
+        (analysis, 'lowest_streak', None),
+        (analysis, 'completion_series', None),
+    ]
+
+
+def is_enabled():
+    return bool(_originals)
+
+def enable(extra=()):
+    """
+    Starts measuring the hot paths, plus (owner, attribute) pairs given in extra
+    (for example the menu actions of HabitTrackerCLI). Calling it again adds the new extras.
+    """
+
+    targets = [] if is_enabled() else hot_paths()
+    targets += [(owner, attribute, None) for owner, attribute in extra]
+    for owner, attribute, io in targets:
+        original = owner.__dict__[attribute] if isinstance(owner, type) else getattr(owner, attribute)
+        name = f"{owner.__name__}.{attribute}"
+        setattr(owner, attribute, measured(name, original, io))
+        _originals.append((owner, attribute, original))
+
+def disable():   # Puts the original functions back (the numbers are kept until reset)
+    while _originals:
+        owner, attribute, original = _originals.pop()
+        setattr(owner, attribute, original)
+
+def reset():
+    _stats.clear()
+
+
+def measured(name, function, io=None):   # function wrapped to record its calls, time and bytes under name
+    stats = _stats.setdefault(name, {'calls': 0, 'total_ns': 0, 'samples': [], 'bytes_read': 0, 'bytes_written': 0})
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        counting = io is not None and not _counting   # save_changes hands off to save_file: the bytes are counted once
+        if counting:
+            state = io.before(*args, **kwargs)
+            _counting.append(name)
+        start = time.perf_counter_ns()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            stats['calls'] += 1
+            stats['total_ns'] += elapsed
+            samples = stats['samples']
+            if len(samples) < SAMPLE_LIMIT:
+                samples.append(elapsed)
+            else:   # Reservoir sampling: every call has the same chance of being kept
+                slot = random.randrange(stats['calls'])
+                if slot < SAMPLE_LIMIT:
+                    samples[slot] = elapsed
+            if counting:
+                _counting.pop()
+                read, written = io.after(state, *args, **kwargs)
+                stats['bytes_read'] += read
+                stats['bytes_written'] += written
+    return wrapper
+
+
+def percentile(ordered, fraction):   # Nearest-rank percentile of a sorted list
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def report():   # The numbers so far as a JSON-friendly dict, times in milliseconds
+    result = {}
+    for name, stats in sorted(_stats.items()):
+        if not stats['calls']:
+            continue
+        ordered = sorted(stats['samples'])
+        result[name] = {
+            'calls': stats['calls'],
+            'total_ms': stats['total_ns'] / 1e6,
+            'mean_ms': stats['total_ns'] / stats['calls'] / 1e6,
+            'p50_ms': percentile(ordered, 0.50) / 1e6,
+            'p90_ms': percentile(ordered, 0.90) / 1e6,
+            'p99_ms': percentile(ordered, 0.99) / 1e6,
+            'max_ms': ordered[-1] / 1e6,
+            'bytes_read': stats['bytes_read'],
+            'bytes_written': stats['bytes_written'],
+        }
+    return result
+
+def print_report():   # The numbers as a table, slowest in total first
+    rows = report()
+    if not rows:
+        print("No statistics yet. Start the app with HABIT_TRACKER_STATS=1 to collect them.")
+        return
+    print(f"\n{'function':<40} {'calls':>7} {'total ms':>10} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'read':>10} {'written':>10}")
+    for name, row in sorted(rows.items(), key=lambda item: -item[1]['total_ms']):
+        print(f"{name:<40} {row['calls']:>7} {row['total_ms']:>10.2f} {row['p50_ms']:>8.3f} {row['p90_ms']:>8.3f} "
+            f"{row['p99_ms']:>8.3f} {row['bytes_read']:>10} {row['bytes_written']:>10}")
+
+def dump_json(filename):   # Saves the report as JSON
+    with open(filename, 'w') as file:
+        json.dump(report(), file, indent=2)
+
+
+def profile(function, *args, output=None, limit=20, **kwargs):
+    """
+    Runs function(*args, **kwargs) under cProfile and returns its result.
+    Saves the profile to output (open it with pstats or snakeviz), or prints
+    the limit most expensive functions if no output is given.
+    """
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args, **kwargs)
+    finally:
+        if output:
+            profiler.dump_stats(output)
+        else:
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(limit)
@@ -0,0 +1,116 @@
+"""
+This file lets a big habits.json open quickly.
+Instead of reading every completion when the file is loaded, it only reads
+the habit details (id, name, periodicity, creation date) and remembers where
+each habit's completions are in the file. A habit reads its completions the
+first time they are needed.
+"""
+
+
+import json
+import mmap
+import re
+import sys
+from datetime import date
+from habit import Habit
+
+
+COMPLETIONS_KEY = re.compile(rb'"completions"\s*:\s*\[')   # Start of a habit's completions list
+
+
+class CompletionSource:
+    """
+    The JSON file mapped into memory, used to read one habit's completions at a time
+    """
+
+    def __init__(self, file):
+        self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, span):   # Decodes the completions list found between the two offsets
+        start, end = span
+        return json.loads(self.map[start:end])
+
+
+class LazyHabit(Habit):
+    """
+    A Habit whose completions stay in the file until they are first used.
+    It behaves exactly like a Habit: reading its completions, streak or
+    completion count loads them.
+    """
+
+    __slots__ = ('_source', '_span')
+
+    def __init__(self, id, name, periodicity, creation_date, source, span):
+        # Doesn't call Habit.__init__ because that would set the completions now
+        self.id = id
+        self.name = name
+        self.periodicity = sys.intern(periodicity)
+        self.creation_date = creation_date
+        self._source = source   # Where to read the completions from, None once they are loaded
+        self._span = span   # (start, end) offsets of the completions list in the file
+
+    def __getattr__(self, name):   # Only called for attributes that are not set yet
+        if name in Habit.COMPLETION_ATTRIBUTES and self._source is not None:
+            self._load_completions()
+            return getattr(self, name)
+        raise AttributeError(name)
+
+    @property
+    def completions_loaded(self):
+        return self._source is None
+
+    def _load_completions(self):
+        source = self._source
+        self._source = None   # Set first so the completions setter doesn't come back here
+        self.completions = source.read(self._span)
+
+
+def read_lazy_habits(filename):
+    """
+    Reads the habits of a JSON file without their completions.
+    Returns (list of LazyHabit, other top-level keys), or None if the file doesn't have
+    the expected shape or is in an older format (the caller should then load it normally).
+    Raises FileNotFoundError if the file doesn't exist.
+    """
+
+    with open(filename, 'rb') as file:
+        try:
+            source = CompletionSource(file)
+        except ValueError:   # Empty file, can't be mapped
+            return None
+
+    text = source.map
+    pieces = []   # The file without the completions lists, small enough to parse at once
+    spans = []
+    position = 0
+
+    while True:
+        match = COMPLETIONS_KEY.search(text, position)
+        if match is None:
+            break
+        start = match.end() - 1   # The '[' of the list
+        end = text.find(b']', start) + 1   # Completions are plain date strings, so the first ']' closes the list
+        if end == 0:
+            return None
+        pieces.append(text[position:start])
+        pieces.append(b'[]')
+        spans.append((start, end))
+        position = end
+    pieces.append(text[position:])
+
+    try:
+        data = json.loads(b''.join(pieces))
+    except ValueError:
+        return None
+
+    habits_data = data.pop('habits', [])
+    if len(habits_data) != len(spans):   # Each habit must have exactly one completions list
+        return None
+    if 'format' not in data and any(b'-W' in text[start:end] for start, end in spans):
+        return None   # Week keys of an older file, migrated when it is read normally
+
+    habits = []
+    for habit_data, span in zip(habits_data, spans):
+        creation_date = date.fromisoformat(habit_data['creation_date'])
+        habits.append(LazyHabit(habit_data['id'], habit_data['name'], habit_data['periodicity'], creation_date, source, span))
+    return habits, data
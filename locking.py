@@ -0,0 +1,32 @@
+"""
+This file stops two copies of the app (for example a cron job and someone
+using the menu) from writing the same habits file at the same time.
+Writers hold an exclusive lock on a small '.lock' file next to the data file
+while they check for other changes and save. Readers don't lock: they check
+the version stamp of the JSON file instead and read again if it changed.
+"""
+
+
+import contextlib
+
+try:
+    import fcntl
+except ImportError:   # Not available on Windows: saving works, but without the lock
+    fcntl = None
+
+
+def lock_name(filename):   # Name of the lock file kept next to a data file
+    return filename + '.lock'
+
+@contextlib.contextmanager
+def file_lock(filename):   # Holds an exclusive lock for the data file until the with block ends
+    if fcntl is None:
+        yield
+        return
+
+    with open(lock_name(filename), 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)   # Waits while another process holds it
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
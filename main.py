@@ -5,14 +5,24 @@ When you run the program, this is what starts and keeps running until you quit.
 """
 
 
+from datetime import date, timedelta
 from habit_tracker import HabitTracker
+from storage import open_storage
+from summary_cache import SummaryCache
 import analysis
 import os
+import sys
 
 class HabitTrackerCLI:
-    def __init__(self):
+    # Menu actions timed when HABIT_TRACKER_STATS is set
+    MEASURED_ACTIONS = ('start', 'view_habit', 'list_all_habits', 'list_habits_by_periodicity', 'view_current_streak',
+        'view_longest_streak', 'view_lowest_streak', 'view_completion_history', 'view_heatmap')
+
+    def __init__(self, data_file='habits.json'):   # A .db/.sqlite data file keeps the habits in SQLite instead of JSON
         self.tracker = HabitTracker()
-        self.data_file = 'habits.json'
+        self.data_file = data_file
+        self.storage = open_storage(data_file, lazy=True)   # Big files open quickly, completions are read when needed
+        self.summaries = SummaryCache(self.tracker, data_file)   # Streaks for the lists, kept between runs
     
     def display_main_menu(self):
         print("\n" + "="*40)
@@ -35,10 +45,13 @@ class HabitTrackerCLI:
         print("a. View current streak for a habit")
         print("b. View longest streak")
         print("c. View lowest streak") 
-        print("d. Back to main menu")
+        print("d. View completions per week or month")
+        print("e. View calendar of the last 12 weeks")
+        print("f. Back to main menu")
     
     def start(self):
-        self.tracker.load_file(self.data_file)
+        self.storage.load(self.tracker)
+        self.summaries.load()
         print(f"Data loaded from {self.data_file}")
 
     def load_test_data(self):   # Load test data for demonstration
@@ -60,7 +73,7 @@ class HabitTrackerCLI:
             return
         
         self.tracker.insert_habit(name, periodicity)
-        self.tracker.save_file(self.data_file)
+        self.storage.save_changes(self.tracker)
 
     def remove_habit(self):
         print("\n--- REMOVE HABIT ---")
@@ -69,7 +82,7 @@ class HabitTrackerCLI:
         try:
             habit_id = int(input("Enter the ID of the habit to remove: "))
             self.tracker.delete_habit(habit_id)
-            self.tracker.save_file(self.data_file)
+            self.storage.save_changes(self.tracker)
         except ValueError:
             print("Error: Please enter a valid number.")
 
@@ -79,10 +92,8 @@ class HabitTrackerCLI:
 
         try:
             habit_id = int(input("Enter the ID of the habit to complete: "))
-            habit = self.tracker.get_habit_by_id(habit_id)
-            if habit:
-                habit.complete_habit()
-                self.tracker.save_file(self.data_file)
+            if self.tracker.complete_habit(habit_id):
+                self.storage.save_changes(self.tracker)
             else: 
                 print("Error: Habit not found.")
         except ValueError:
@@ -101,9 +112,14 @@ class HabitTrackerCLI:
                 print(f"Name: {habit.name}")
                 print(f"Periodicity: {habit.periodicity}")
                 print(f"Creation Date: {habit.creation_date}")
-                print(f"Current Streak: {analysis.current_streak(habit)}")
-                print(f"Completion Rate: {analysis.completion_rate(habit):.1f}%")
-                print(f"Completions: {len(habit.completions)}")
+                today = self.tracker.clock()
+                print(f"Current Streak: {analysis.current_streak(habit, today)}")
+                print(f"Best Streak: {analysis.best_streak(habit)}")
+                print(f"Completion Rate: {analysis.completion_rate(habit, today):.1f}%")
+                print(f"Completions: {habit.completion_count}")
+                month_ago = today - timedelta(days=29)
+                print(f"Last 30 Days: {analysis.completions_between(habit, month_ago, today)} completions "
+                    f"({analysis.completion_rate_between(habit, month_ago, today):.1f}%)")
             else:
                 print("Sorry! Habit not found.")
         except ValueError:
@@ -118,9 +134,9 @@ class HabitTrackerCLI:
         
         print("\n--- ALL HABITS ---")
         for habit in habits:
-            streak = analysis.current_streak(habit)
-            rate = analysis.completion_rate(habit)
+            streak = self.summaries.streak(habit)   # Remembered, so the completions don't have to be read
             print(f"ID: {habit.id} | Name: {habit.name} | Periodicity: {habit.periodicity} | Streak: {streak}")
+        self.summaries.save()
 
     def list_habits_by_periodicity(self):
         print("\n--- FILTER BY PERIODICITY ---")
@@ -138,15 +154,15 @@ class HabitTrackerCLI:
         
         print(f"\n--- {periodicity.upper()} HABITS ---")
         for habit in habits:
-            streak = analysis.current_streak(habit)
-            rate = analysis.completion_rate(habit)
+            streak = self.summaries.streak(habit)
             print(f"ID: {habit.id} | Name: {habit.name} | Streak: {streak}")
+        self.summaries.save()
 
     
     def analysis_menu(self):
         while True:
             self.display_analysis_menu()
-            choice = input("Select an option (a-d): ").lower()
+            choice = input("Select an option (a-f): ").lower()
 
             if choice == 'a':
                 self.view_current_streak()
@@ -155,9 +171,13 @@ class HabitTrackerCLI:
             elif choice == 'c':
                 self.view_lowest_streak() 
             elif choice == 'd':
+                self.view_completion_history()
+            elif choice == 'e':
+                self.view_heatmap()
+            elif choice == 'f':
                 break
             else:
-                print("Invalid option. Please choose a, b, c or d.")
+                print("Invalid option. Please choose a, b, c, d, e or f.")
 
     def view_current_streak(self):
         self.list_all_habits()
@@ -166,27 +186,74 @@ class HabitTrackerCLI:
             habit_id = int(input("Enter habit ID: "))
             habit = self.tracker.get_habit_by_id(habit_id)
             if habit:
-                streak = analysis.current_streak(habit)  
+                streak = analysis.current_streak(habit, self.tracker.clock())
                 print(f"Current streak for '{habit.name}': {streak}")
             else:
                 print("Sorry! Habit not found")
         except ValueError:
             print("Error: Please enter a valid number")
 
+    def ask_for_habit(self):   # Lists the habits and returns the one the user picks, or None
+        self.list_all_habits()
+
+        try:
+            habit = self.tracker.get_habit_by_id(int(input("Enter habit ID: ")))
+        except ValueError:
+            print("Error: Please enter a valid number")
+            return None
+        if habit is None:
+            print("Sorry! Habit not found")
+        return habit
+
+    def view_completion_history(self):   # Completions per week for the last 12 weeks, or per month for the last 12 months
+        habit = self.ask_for_habit()
+        if habit is None:
+            return
+
+        bucket = input("Show per week or per month? (week/month): ").lower()
+        if bucket not in ('week', 'month'):
+            print("Error: Please enter 'week' or 'month'.")
+            return
+
+        end = self.tracker.clock()
+        if bucket == 'week':
+            start = end - timedelta(weeks=11, days=end.weekday())
+        else:
+            start = date(end.year - 1 + (end.month == 12), end.month % 12 + 1, 1)
+
+        print(f"\nCompletions per {bucket} for '{habit.name}':")
+        for first, count, rate in analysis.completion_series(habit, start, end, bucket):
+            label = first.isoformat() if bucket == 'week' else first.strftime('%Y-%m')
+            print(f"{label:<10} {'#' * count:<31} {count} ({rate:.0f}%)")
+
+    def view_heatmap(self):   # Calendar of the last 12 weeks: # done, . missed
+        habit = self.ask_for_habit()
+        if habit is None:
+            return
+
+        first_monday, rows = analysis.heatmap(habit, self.tracker.clock())
+        print(f"\nLast 12 weeks of '{habit.name}' (from {first_monday}, # done, . missed):")
+        for weekday, row in zip(('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'), rows):
+            print(weekday, ' '.join({1: '#', 0: '.', None: ' '}[value] for value in row))
+
     def view_longest_streak(self):
-        habit = analysis.longest_streak(self.tracker)
+        today = self.tracker.clock()
+        habit = analysis.longest_streak(self.tracker, today)
 
         if habit:
-            streak = analysis.current_streak(habit)
-            print(f"Longest streak is for '{habit.name}' with a streak of {streak}.")
+            streak = analysis.current_streak(habit, today)
+            print(f"Longest current streak is for '{habit.name}' with a streak of {streak}.")
+            best_habit = analysis.longest_ever_streak(self.tracker)
+            print(f"Best streak ever is for '{best_habit.name}' with a streak of {analysis.best_streak(best_habit)}.")
         else:
             print("Sorry! No habits found.")
 
     def view_lowest_streak(self):  
-        habit = analysis.lowest_streak(self.tracker)
+        today = self.tracker.clock()
+        habit = analysis.lowest_streak(self.tracker, today)
 
         if habit:
-            streak = analysis.current_streak(habit)
+            streak = analysis.current_streak(habit, today)
             print(f"Lowest streak is for '{habit.name}' with a streak of {streak}.")
         else:
             print("Sorry! No habits found.")
@@ -220,13 +287,35 @@ class HabitTrackerCLI:
                 self.load_test_data()
             elif choice == '10':
                 print("Exiting the application. Goodbye!")
+                self.summaries.save()
+                self.storage.close()
                 break
+            elif choice == 'stats':   # Hidden: timing statistics, see instrumentation.py
+                import instrumentation
+                instrumentation.print_report()
             else:
                 print("Invalid option. Please choose a number between 1 and 10.")
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:   # Commands like 'python main.py complete 3' run without the menu
+        import batch_cli
+        sys.exit(batch_cli.main(sys.argv[1:]))
     app = HabitTrackerCLI()
-    app.run()
+
+    stats = os.environ.get('HABIT_TRACKER_STATS')   # Opt-in timing statistics (shown with the hidden 'stats' option)
+    profile = os.environ.get('HABIT_TRACKER_PROFILE')   # Opt-in cProfile of the whole run, saved to that file
+    if stats or profile:
+        import instrumentation
+        if stats:
+            instrumentation.enable(extra=[(HabitTrackerCLI, name) for name in HabitTrackerCLI.MEASURED_ACTIONS])
+        if profile:
+            instrumentation.profile(app.run, output=profile)
+        else:
+            app.run()
+        if stats and stats.endswith('.json'):
+            instrumentation.dump_json(stats)
+    else:
+        app.run()
 
 
         
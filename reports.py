@@ -0,0 +1,144 @@
+"""
+This file builds one report over many habit files at once, for example every
+user's file for a nightly summary. The files are split into chunks and each
+chunk is loaded and analysed in a separate process, so the work spreads over
+all CPU cores. Workers send back small summaries (numbers and names), not the
+habits themselves, and the summaries are added up into a single report.
+
+python reports.py data/ other_habits.json [--workers 4] [--chunk-size 20] [--output report.json]
+(folders are searched for .json files)
+"""
+
+
+import argparse
+import contextlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import analysis
+from habit_tracker import HabitTracker
+
+
+TOP_STREAKS = 10   # Number of habits listed in the report's top streaks
+
+
+def find_data_files(paths):   # The .json files given, plus the .json files in the folders given (sorted)
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, _, names in os.walk(path):
+                files.extend(os.path.join(folder, name) for name in names if name.endswith('.json'))
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def summarize_file(filename):
+    """
+    Loads one habit file and returns its summary as plain data:
+    counts, the sum of the completion rates and one (streak, best streak, name) tuple per habit.
+    If the file can't be loaded, returns {'file': filename, 'error': ...} instead.
+    """
+
+    tracker = HabitTracker()
+    with contextlib.redirect_stdout(io.StringIO()):   # load_file prints its messages for the menu
+        tracker.load_file(filename)
+    if tracker.source is None:
+        return {'file': filename, 'error': "could not be loaded"}
+
+    today = tracker.clock()
+    habits = tracker.habits
+    return {
+        'file': filename,
+        'habits': len(habits),
+        'daily': sum(1 for habit in habits if habit.periodicity == 'daily'),
+        'completions': sum(habit.completion_count for habit in habits),
+        'rate_total': sum(analysis.completion_rate(habit, today) for habit in habits),
+        'streaks': [(analysis.current_streak(habit, today), analysis.best_streak(habit), habit.name) for habit in habits],
+    }
+
+
+def summarize_chunk(filenames):   # Runs in a worker process: the summaries of a chunk of files
+    return [summarize_file(filename) for filename in filenames]
+
+
+def chunked(items, size):   # Splits a list into lists of at most size items
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def aggregate(summaries, top=TOP_STREAKS):   # Adds up file summaries into one report
+    report = {'files': 0, 'habits': 0, 'daily': 0, 'weekly': 0, 'completions': 0,
+        'average_completion_rate': 0.0, 'average_streak': 0.0, 'top_streaks': [], 'top_best_streaks': [], 'errors': []}
+    rate_total = streak_total = 0
+    current, best = [], []   # (streak, file, name) of every habit
+
+    for summary in summaries:
+        if 'error' in summary:
+            report['errors'].append({'file': summary['file'], 'error': summary['error']})
+            continue
+        report['files'] += 1
+        report['habits'] += summary['habits']
+        report['daily'] += summary['daily']
+        report['completions'] += summary['completions']
+        rate_total += summary['rate_total']
+        for streak, best_streak, name in summary['streaks']:
+            streak_total += streak
+            current.append((streak, summary['file'], name))
+            best.append((best_streak, summary['file'], name))
+
+    def ranked(streaks):   # Highest streaks first, ties in file and name order
+        streaks.sort(key=lambda item: (-item[0], item[1], item[2]))
+        return [{'file': file, 'name': name, 'streak': streak} for streak, file, name in streaks[:top]]
+
+    report['weekly'] = report['habits'] - report['daily']
+    if report['habits']:
+        report['average_completion_rate'] = round(rate_total / report['habits'], 2)
+        report['average_streak'] = round(streak_total / report['habits'], 2)
+    report['top_streaks'] = ranked(current)
+    report['top_best_streaks'] = ranked(best)
+    return report
+
+
+def run_report(filenames, workers=None, chunk_size=None):
+    """
+    Summarizes every file and returns the aggregated report.
+    workers: number of processes (default: one per CPU core); with 1 everything runs in this process
+    chunk_size: files handed to a worker at a time (default: about 4 chunks per worker)
+    """
+
+    filenames = list(filenames)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(filenames) // (workers * 4)))   # Rounded up
+    chunks = chunked(filenames, chunk_size)
+
+    if workers == 1 or len(chunks) <= 1:
+        results = map(summarize_chunk, chunks)
+        return aggregate(summary for chunk in results for summary in chunk)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(summarize_chunk, chunks)   # Comes back in the same order as the chunks
+        return aggregate(summary for chunk in results for summary in chunk)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streak and completion report over many habit files")
+    parser.add_argument('paths', nargs='+', help="habit files or folders holding them")
+    parser.add_argument('--workers', type=int, default=None, help="processes to use (default: one per CPU core)")
+    parser.add_argument('--chunk-size', type=int, default=None, help="files per task")
+    parser.add_argument('--output', default=None, help="save the report to this file instead of printing it")
+    args = parser.parse_args(argv)
+
+    report = run_report(find_data_files(args.paths), args.workers, args.chunk_size)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Report saved to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+This file keeps track of when each habit is next due, so the app can tell
+which habits are about to break their streak without working out every streak.
+A habit is due by the end of the day (daily) or of the ISO week (weekly) after
+its last completion, or by the end of the day/week it was created in if it was
+never completed. The deadlines are kept in a heap that is updated when habits
+are added, completed or deleted, so asking for the habits due in the next few
+hours only looks at those habits.
+"""
+
+
+import heapq
+from datetime import date, datetime, time
+
+from habit import week_ordinal, week_start
+
+
+def deadline(habit):   # Day ordinal of the midnight by which a habit has to be completed again
+    ordinals = habit.completion_ordinals()
+    if habit.periodicity == 'weekly':
+        week = ordinals[-1] + 1 if ordinals else week_ordinal(habit.creation_date)   # The week it is due in
+        return week_start(week + 1).toordinal()
+    day = ordinals[-1] + 1 if ordinals else habit.creation_date.toordinal()   # The day it is due on
+    return day + 1
+
+def streak_at_stake(habit):   # Length of the run that ends if the habit isn't completed by its deadline (0 without completions)
+    ordinals = habit.completion_ordinals()
+    if not ordinals:
+        return 0
+    last = week_start(ordinals[-1]) if habit.periodicity == 'weekly' else date.fromordinal(ordinals[-1])
+    return habit.streak_on(last)   # calculate_streak is already 0 when only yesterday/last week was done
+
+def moment(when):   # A datetime as a day ordinal with the time of day as a fraction, to compare with deadlines
+    return when.toordinal() + (when - datetime.combine(when.date(), time())).total_seconds() / 86400
+
+
+class Scheduler:
+    """
+    Next deadline of every habit of a tracker, in a heap ordered by deadline
+    Attributes:
+    - tracker: the HabitTracker whose habits are scheduled
+    - now: function returning the current date and time (datetime.now, or the
+      start of the tracker's day when the tracker has its own clock)
+    Deadlines are always at midnight, so habits due at the same time share one
+    heap entry holding the IDs of those habits. The heap only has a few entries
+    (one per day/week ahead), and moving a habit to another deadline is O(1)
+    unless that deadline is new. Habits whose deadline has passed are moved out
+    of the heap, so they don't slow down the next questions.
+    """
+
+    def __init__(self, tracker, now=None):
+        self.tracker = tracker
+        if now is None:
+            # == and not "is": date.today gives a new bound method every time it is looked up
+            now = datetime.now if tracker.clock == date.today else lambda: datetime.combine(tracker.clock(), time())
+        self.now = now
+        self._deadlines = {}   # habit id -> deadline of the habits in the heap
+        self._buckets = {}   # deadline -> set of the habit IDs due then (may be empty), one per heap entry
+        self._heap = []   # The deadlines of _buckets
+        self._overdue = {}   # habit id -> deadline of the habits whose deadline has passed
+        self._checked = None   # Moment up to which passed deadlines were moved to _overdue
+        self._stale = True   # True when everything has to be worked out again from the tracker
+        tracker.listeners.append(self.changed)
+
+    def rebuild(self):   # Works out every deadline again and builds the heap in one go (O(n))
+        self._deadlines = {habit.id: deadline(habit) for habit in self.tracker.habits}
+        self._buckets = {}
+        for habit_id, due in self._deadlines.items():
+            self._buckets.setdefault(due, set()).add(habit_id)
+        self._heap = list(self._buckets)
+        heapq.heapify(self._heap)
+        self._overdue = {}
+        self._checked = None
+        self._stale = False
+
+    def changed(self, operation):   # Tracker listener: moves the habit that changed to its new deadline
+        if operation['op'] == 'reload':
+            self._stale = True   # Rebuilt on the next question, once the tracker has all its habits back
+            return
+        if self._stale or operation['op'] == 'synced':
+            return
+
+        habit_id = operation['id']
+        habit = self.tracker.get_habit_by_id(habit_id)
+        due = None if habit is None else deadline(habit)
+        old = self._deadlines.pop(habit_id, None)
+        if old is not None:
+            self._buckets[old].discard(habit_id)   # An empty bucket stays until its deadline passes
+        self._overdue.pop(habit_id, None)
+        if due is not None:
+            self._schedule(habit_id, due)
+
+    def _schedule(self, habit_id, due):
+        if self._checked is not None and due <= self._checked:
+            self._overdue[habit_id] = due
+            return
+        self._deadlines[habit_id] = due
+        bucket = self._buckets.get(due)
+        if bucket is None:
+            bucket = self._buckets[due] = set()
+            heapq.heappush(self._heap, due)
+        bucket.add(habit_id)
+
+    def _expire(self, now):   # Moves the habits whose deadline passed by now out of the heap
+        if self._stale or (self._checked is not None and now < self._checked):   # The clock went back: start again
+            self.rebuild()
+        heap = self._heap
+        while heap and heap[0] <= now:
+            due = heapq.heappop(heap)
+            for habit_id in self._buckets.pop(due):
+                del self._deadlines[habit_id]
+                self._overdue[habit_id] = due
+        self._checked = now
+
+    def _upcoming(self, limit):   # Yields the deadlines up to limit, earliest first, by walking the heap from the top without changing it
+        heap = self._heap
+        candidates = [(heap[0], 0)] if heap else []
+        while candidates:
+            due, index = heapq.heappop(candidates)
+            if due > limit:
+                return
+            yield due
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(heap):
+                    heapq.heappush(candidates, (heap[child], child))
+
+    def due_within(self, hours, now=None):
+        """
+        Habits that have to be completed within the next hours to keep going, as (deadline, habit)
+        pairs, earliest first. Habits whose deadline already passed are left out (see overdue).
+        Takes O(k log k) for k habits due, however many habits there are.
+        """
+
+        now = self.now() if now is None else now
+        self._expire(moment(now))
+        found = []
+        for due in self._upcoming(moment(now) + hours / 24):
+            when = datetime.fromordinal(due)
+            found += [(when, self.tracker.get_habit_by_id(habit_id)) for habit_id in sorted(self._buckets[due])]
+        return found
+
+    def at_risk(self, hours=24, now=None):   # Habits with a streak that ends unless they are completed within the next hours
+        return [(due, habit) for due, habit in self.due_within(hours, now) if habit.completion_count]
+
+    def overdue(self, now=None):   # Habits whose deadline has passed (streak broken, or never completed), as (deadline, habit), earliest first
+        now = self.now() if now is None else now
+        self._expire(moment(now))
+        return [(datetime.fromordinal(due), self.tracker.get_habit_by_id(habit_id))
+            for habit_id, due in sorted(self._overdue.items(), key=lambda item: (item[1], item[0]))]
+
+    def next_due(self, habit_id):   # When a habit has to be completed again, or None if there is no such habit
+        habit = self.tracker.get_habit_by_id(habit_id)
+        return None if habit is None else datetime.fromordinal(deadline(habit))
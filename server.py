@@ -0,0 +1,254 @@
+"""
+This file runs the habit tracker as a small local web service.
+One process keeps the habits in memory and answers JSON requests, so many
+clients (scripts, dashboards, other apps) can use the same habits without
+each of them loading the file. Changes are saved in the background every
+few seconds instead of on every request.
+
+python server.py [--file habits.json] [--port 8765] [--flush-interval 2]
+
+Endpoints:
+- GET    /habits                          all habits (?periodicity=daily|weekly to filter)
+- POST   /habits                          add a habit: {"name": ..., "periodicity": ...}
+- GET    /habits/<id>                     one habit with its streaks and completion rate
+- DELETE /habits/<id>                     remove a habit
+- POST   /habits/<id>/complete            complete a habit for today
+- GET    /analysis/longest-streak         habit with the longest current streak
+- GET    /analysis/lowest-streak          habit with the lowest current streak
+- GET    /analysis/longest-ever-streak    habit with the best streak ever
+- GET    /analysis/stats                  the same statistics as 'python main.py stats'
+"""
+
+
+import argparse
+import asyncio
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+import io
+import json
+import re
+from urllib.parse import parse_qs, urlsplit
+
+import analysis
+from batch_cli import habit_summary, row_name, tracker_stats
+from habit_tracker import HabitTracker
+from storage import open_storage
+
+
+REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+MAX_BODY = 1024 * 1024   # Requests bigger than this are refused
+
+
+class HttpError(Exception):   # Raised by a handler to answer with an error status
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class HabitServer:
+    """
+    Keeps one HabitTracker in memory and answers HTTP/JSON requests for it
+    Attributes:
+    - tracker: the HabitTracker all requests use
+    - storage: where changes are saved, every flush_interval seconds
+    - flush_interval: seconds between background saves
+    Saving (locking and syncing the file) runs in one worker thread, always
+    the same, so the server keeps accepting connections meanwhile; requests
+    wait for the save to finish before they use the tracker.
+    """
+
+    def __init__(self, storage, flush_interval=2.0):
+        self.tracker = HabitTracker()
+        self.storage = storage
+        self.flush_interval = flush_interval
+        self.lock = asyncio.Lock()   # Held while a request or a save uses the tracker
+        self._saver = ThreadPoolExecutor(max_workers=1)   # The thread that saves
+        self.routes = [   # (method, path pattern, handler)
+            ('GET', re.compile(r'/habits'), self.list_habits),
+            ('POST', re.compile(r'/habits'), self.add_habit),
+            ('GET', re.compile(r'/habits/(\d+)'), self.view_habit),
+            ('DELETE', re.compile(r'/habits/(\d+)'), self.remove_habit),
+            ('POST', re.compile(r'/habits/(\d+)/complete'), self.complete_habit),
+            ('GET', re.compile(r'/analysis/longest-streak'), self.longest_streak),
+            ('GET', re.compile(r'/analysis/lowest-streak'), self.lowest_streak),
+            ('GET', re.compile(r'/analysis/longest-ever-streak'), self.longest_ever_streak),
+            ('GET', re.compile(r'/analysis/stats'), self.stats),
+        ]
+        self._server = None
+        self._flusher = None
+
+    async def start(self, host='127.0.0.1', port=8765):   # Loads the habits and starts listening (port 0 picks a free port)
+        self.quietly(self.storage.load, self.tracker)
+        self._server = await asyncio.start_server(self.handle_connection, host, port)
+        self._flusher = asyncio.ensure_future(self.flush_regularly())
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):   # Stops listening and saves what is left
+        self._server.close()
+        await self._server.wait_closed()
+        self._flusher.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._flusher
+        await self.flush()
+        self._saver.shutdown()
+
+    async def flush(self):   # Saves the changes made since the last flush (kept for the next flush if saving fails)
+        async with self.lock:
+            if not self.tracker.has_changes():
+                return
+            try:
+                await asyncio.get_running_loop().run_in_executor(self._saver, self.quietly, self.storage.save_changes, self.tracker)
+            except Exception as error:   # Keeps the background saves going; the storages only drop changes once they are saved
+                print(f"Error saving habits: {error}")
+
+    async def flush_regularly(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def quietly(self, function, *args):   # Calls a tracker/storage function without printing its messages (they are meant for the menu)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return function(*args)
+
+    async def handle_connection(self, reader, writer):   # Answers requests on one connection (keep-alive) until it closes
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = headers.get('content-length', '0')
+                if not length.isdigit() or int(length) > MAX_BODY:
+                    # The body is not read, so the connection can't be used for another request
+                    status, payload = 400, {'error': "bad or too large request body"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(int(length)) if int(length) else b''
+                    async with self.lock:
+                        status, payload = self.dispatch(request_line.decode('latin-1'), body)
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+
+                data = json.dumps(payload).encode('utf-8')
+                writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def dispatch(self, request_line, body):   # Finds the handler for a request, returns (status, JSON payload)
+        try:
+            method, target, _ = request_line.split(' ', 2)
+            url = urlsplit(target)
+            allowed = False
+            for route_method, pattern, handler in self.routes:
+                match = pattern.fullmatch(url.path)
+                if match is None:
+                    continue
+                allowed = True
+                if route_method == method:
+                    arguments = [int(group) for group in match.groups()]
+                    data = json.loads(body) if body else {}
+                    if not isinstance(data, dict):
+                        raise HttpError(400, "the body must be a JSON object")
+                    return handler(*arguments, query=parse_qs(url.query), data=data)
+            raise HttpError(405 if allowed else 404, "method not allowed" if allowed else "not found")
+        except HttpError as error:
+            return error.status, {'error': str(error)}
+        except ValueError:
+            return 400, {'error': "bad request"}
+        except Exception as error:   # Keeps the server running whatever happens in a handler
+            return 500, {'error': str(error)}
+
+    def find_habit(self, habit_id):
+        habit = self.tracker.get_habit_by_id(habit_id)
+        if habit is None:
+            raise HttpError(404, "habit not found")
+        return habit
+
+    def list_habits(self, query, data):
+        periodicity = query.get('periodicity', [None])[0]
+        if periodicity is None:
+            habits = analysis.get_habits(self.tracker)
+        else:
+            habits = analysis.list_habits_by_periodicity(self.tracker, periodicity)
+        today = self.tracker.clock()
+        return 200, {'habits': [habit_summary(habit, today) for habit in habits]}
+
+    def add_habit(self, query, data):
+        name = row_name(data)   # ValueError (400) unless it is text
+        periodicity = str(data.get('periodicity', '')).lower()
+        if not name or periodicity not in ('daily', 'weekly'):
+            raise HttpError(400, "needs a name and a periodicity ('daily' or 'weekly')")
+        habit = self.quietly(self.tracker.insert_habit, name, periodicity)
+        return 201, habit_summary(habit, self.tracker.clock())
+
+    def view_habit(self, habit_id, query, data):
+        return 200, habit_summary(self.find_habit(habit_id), self.tracker.clock())
+
+    def remove_habit(self, habit_id, query, data):
+        self.find_habit(habit_id)
+        self.quietly(self.tracker.delete_habit, habit_id)
+        return 200, {'deleted': habit_id}
+
+    def complete_habit(self, habit_id, query, data):
+        habit = self.find_habit(habit_id)
+        self.quietly(self.tracker.complete_habit, habit_id)
+        return 200, habit_summary(habit, self.tracker.clock())
+
+    def streak_answer(self, habit, streak):
+        if habit is None:
+            raise HttpError(404, "no habits")
+        return 200, {'id': habit.id, 'name': habit.name, 'streak': streak(habit)}
+
+    def longest_streak(self, query, data):
+        today = self.tracker.clock()
+        return self.streak_answer(analysis.longest_streak(self.tracker, today), lambda habit: analysis.current_streak(habit, today))
+
+    def lowest_streak(self, query, data):
+        today = self.tracker.clock()
+        return self.streak_answer(analysis.lowest_streak(self.tracker, today), lambda habit: analysis.current_streak(habit, today))
+
+    def longest_ever_streak(self, query, data):
+        return self.streak_answer(analysis.longest_ever_streak(self.tracker), analysis.best_streak)
+
+    def stats(self, query, data):
+        return 200, tracker_stats(self.tracker)
+
+
+async def serve(data_file, host, port, flush_interval):   # Runs the server until it is interrupted
+    server = HabitServer(open_storage(data_file), flush_interval)
+    port = await server.start(host, port)
+    print(f"Habit tracker listening on http://{host}:{port}")
+    try:
+        await asyncio.Event().wait()   # Forever
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Habit tracker JSON service")
+    parser.add_argument('--file', default='habits.json')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--flush-interval', type=float, default=2.0, help="seconds between saves")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.file, args.host, args.port, args.flush_interval))
+    except KeyboardInterrupt:
+        print("Server stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+This file decides where your habits are kept between runs.
+A storage loads habits into a HabitTracker and saves the changes made since.
+There is one storage for the usual JSON file (with its log), one for an
+SQLite database, which saves each change as a single row and can answer
+questions about completions without loading them all, and one for the
+compact binary format.
+"""
+
+
+from datetime import date
+from habit import Habit, parse_completion, week_start
+# sqlite3 and binary_format are only imported when those storages are used, so the usual JSON start is faster
+
+
+class Storage:
+    """
+    Common interface of all storages
+    - load(tracker): replaces the habits in the tracker with the saved ones
+    - save_changes(tracker): saves what changed in the tracker since the last load/save
+    - close(): releases the file or connection
+    """
+
+    def load(self, tracker):
+        raise NotImplementedError
+
+    def save_changes(self, tracker):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JsonStorage(Storage):
+    """
+    Keeps habits in a JSON file plus its operation log (see HabitTracker.save_changes)
+    With lazy=True completions are only read from the file when a habit needs them.
+    """
+
+    def __init__(self, filename, lazy=False):
+        self.filename = filename
+        self.lazy = lazy
+
+    def load(self, tracker):
+        tracker.load_file(self.filename, lazy=self.lazy)
+
+    def save_changes(self, tracker):
+        tracker.save_changes(self.filename)
+
+
+class SQLiteStorage(Storage):
+    """
+    Keeps habits in an SQLite database with two tables:
+    - habits: id, name, periodicity, creation_date
+    - completions: habit_id, day (ISO date; the Monday of the week for weekly habits)
+    Completions are indexed by (habit_id, day), so range queries only read the rows they need.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS habits (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            periodicity TEXT NOT NULL,
+            creation_date TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS completions (
+            habit_id INTEGER NOT NULL REFERENCES habits(id) ON DELETE CASCADE,
+            day TEXT NOT NULL,
+            PRIMARY KEY (habit_id, day)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path):
+        import sqlite3
+        self.path = path
+        # Another thread may use the connection (the server saves from a worker thread), one thread at a time
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")   # Readers don't wait for writers
+        self.connection.execute("PRAGMA foreign_keys=ON")   # Deleting a habit deletes its completions
+        self.connection.executescript(self.SCHEMA)
+
+    def load(self, tracker):
+        completions = {}   # habit id -> list of days
+        for habit_id, day in self.connection.execute("SELECT habit_id, day FROM completions ORDER BY habit_id, day"):
+            completions.setdefault(habit_id, []).append(day)
+
+        habits = []
+        for habit_id, name, periodicity, creation_date in self.connection.execute("SELECT id, name, periodicity, creation_date FROM habits ORDER BY id"):
+            habits.append(Habit(habit_id, name, periodicity, date.fromisoformat(creation_date), completions.get(habit_id, [])))
+
+        tracker.habits = habits
+        tracker.take_changes()   # The tracker now matches the database
+        tracker.source = self.path
+        tracker.synced(self.path)   # Not after saving: changes from other connections aren't read back then
+
+    def save_changes(self, tracker):
+        """
+        Saves each change in its own small transaction. A change is only taken out
+        of the tracker once its transaction has committed, so if the database can't
+        be written (for example while another connection holds a lock) the changes
+        not saved yet stay in the tracker for the next save.
+        """
+
+        import sqlite3
+        if tracker.source != self.path:   # Habits came from somewhere else (for example the test data)
+            self.save_all(tracker)
+            return
+
+        saved = 0
+        try:
+            for operation in tracker.pending_changes():
+                with self.connection:   # Commits, or rolls back if something fails
+                    self._save_operation(tracker, operation)
+                saved += 1
+        except sqlite3.Error:
+            print("Error saving habits to file.")
+        finally:
+            tracker.forget_changes(saved)
+
+    def _save_operation(self, tracker, operation):   # Writes one change (inside a transaction)
+        if operation['op'] == 'insert':
+            # Keeps the tracker's ID unless another connection already used it (or a higher one); then picks an ID
+            # free both in the database and in the tracker, in one statement
+            cursor = self.connection.execute("INSERT INTO habits (id, name, periodicity, creation_date) "
+                "SELECT CASE WHEN IFNULL(MAX(id), 0) < ? THEN ? ELSE MAX(MAX(id) + 1, ?) END, ?, ?, ? FROM habits",
+                (operation['id'], operation['id'], tracker.next_id, operation['name'], operation['periodicity'], operation['creation_date']))
+            if cursor.lastrowid != operation['id']:
+                tracker.renumber_habit(operation['id'], cursor.lastrowid)   # Also moves the later changes of this habit
+        elif operation['op'] == 'delete':
+            self.connection.execute("DELETE FROM habits WHERE id = ?", (operation['id'],))
+        elif operation['op'] == 'complete':
+            periodicity = self._periodicity(operation['id'])
+            if periodicity is not None:
+                day = completion_day(operation['completion'], periodicity)
+                self.connection.execute("INSERT OR IGNORE INTO completions (habit_id, day) VALUES (?, ?)", (operation['id'], day))
+
+    def save_all(self, tracker):   # Replaces everything in the database with the habits in the tracker
+        import sqlite3
+        try:
+            with self.connection:
+                self.connection.execute("DELETE FROM habits")
+                for habit in tracker.habits:
+                    self.connection.execute("INSERT INTO habits (id, name, periodicity, creation_date) VALUES (?, ?, ?, ?)",
+                        (habit.id, habit.name, habit.periodicity, habit.creation_date.isoformat()))
+                    self.connection.executemany("INSERT INTO completions (habit_id, day) VALUES (?, ?)",
+                        ((habit.id, completion_day(value, habit.periodicity)) for value in habit.completions))
+        except sqlite3.Error:
+            print("Error saving habits to file.")
+            return
+        tracker.take_changes()
+        tracker.source = self.path
+
+    def _periodicity(self, habit_id):
+        row = self.connection.execute("SELECT periodicity FROM habits WHERE id = ?", (habit_id,)).fetchone()
+        return row[0] if row else None
+
+    def completions_in_range(self, habit_id, start, end):   # Yields the completion dates between start and end (both included)
+        cursor = self.connection.execute("SELECT day FROM completions WHERE habit_id = ? AND day BETWEEN ? AND ? ORDER BY day",
+            (habit_id, start.isoformat(), end.isoformat()))
+        for (day,) in cursor:
+            yield date.fromisoformat(day)
+
+    def count_completions_in_range(self, habit_id, start, end):   # Number of completions between start and end (both included)
+        row = self.connection.execute("SELECT COUNT(*) FROM completions WHERE habit_id = ? AND day BETWEEN ? AND ?",
+            (habit_id, start.isoformat(), end.isoformat())).fetchone()
+        return row[0]
+
+    def completion_counts(self):   # Returns {habit id: number of completions} for every habit
+        rows = self.connection.execute("SELECT habits.id, COUNT(completions.day) FROM habits LEFT JOIN completions ON completions.habit_id = habits.id GROUP BY habits.id")
+        return dict(rows)
+
+    def close(self):
+        self.connection.close()
+
+
+class BinaryStorage(Storage):
+    """
+    Keeps habits in the compact binary format of binary_format.py
+    The file can't be appended to, so every save writes it again.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def load(self, tracker):
+        from binary_format import read_binary
+        habits, version = [], 0
+        try:
+            habits, version = read_binary(self.filename)
+        except FileNotFoundError:   # A new file: start with no habits
+            pass
+        except Exception:
+            print("Error loading habits from file.")
+        tracker.habits = habits
+        tracker.version = version
+        tracker.take_changes()
+        tracker.source = self.filename
+        tracker.synced(self.filename)
+
+    def save_changes(self, tracker):   # Writes the whole file if anything changed
+        if tracker.source == self.filename and not tracker.has_changes():
+            return
+        from binary_format import write_binary
+        try:
+            write_binary(self.filename, tracker.habits, tracker.version + 1)
+        except Exception:
+            print("Error saving habits to file.")
+            return
+        tracker.take_changes()
+        tracker.source = self.filename
+        tracker.version += 1
+        tracker.synced(self.filename)   # The whole file was just written from the tracker
+
+
+def completion_day(value, periodicity):   # Date stored in the database for a completion given as JSON text
+    if periodicity == 'weekly':
+        return week_start(parse_completion(value, periodicity)).isoformat()
+    return value
+
+def open_storage(filename, lazy=False):   # Picks the storage from the file name: .db/.sqlite use SQLite, .hbin the binary format, anything else JSON
+    if filename.endswith(('.db', '.sqlite', '.sqlite3')):
+        return SQLiteStorage(filename)
+    if filename.endswith('.hbin'):
+        return BinaryStorage(filename)
+    return JsonStorage(filename, lazy=lazy)
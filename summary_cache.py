@@ -0,0 +1,112 @@
+"""
+This file remembers each habit's current streak, completion rate and last
+completion in a small file next to the data file (habits.json.summary), so the
+habit lists can be shown right after starting without reading every completion.
+The remembered numbers are only used on the day they were worked out and while
+the data file hasn't been changed by anything else. When a habit changes, only
+that habit's numbers are worked out again.
+"""
+
+
+import json
+import os
+
+import analysis
+from atomic_file import write_atomically
+from habit import format_completion
+
+
+def summary_name(filename):   # Name of the summary file kept next to a data file
+    return filename + '.summary'
+
+def files_state(filename):   # (modification time, size) of the data file and the files that go with it (None if missing)
+    state = []
+    for name in (filename, filename + '.log', filename + '-wal'):   # The JSON log, or SQLite's write-ahead log
+        try:
+            stat = os.stat(name)
+            state.append([stat.st_mtime_ns, stat.st_size])
+        except OSError:
+            state.append(None)
+    return state
+
+
+class SummaryCache:
+    """
+    Streak, completion rate and last completion of each habit of a tracker,
+    worked out once per day and kept in a summary file
+    Attributes:
+    - tracker: the HabitTracker the summaries are for
+    - filename: the data file the tracker is loaded from and saved to
+    """
+
+    def __init__(self, tracker, filename):
+        self.tracker = tracker
+        self.filename = filename
+        self._day = tracker.clock()   # Day the summaries are for
+        self._summaries = {}   # habit id -> (streak, rate, last completion or None)
+        self._dirty = False   # True when the summary file is out of date
+        self._state = None   # files_state of the data file when the tracker last matched it (None: never)
+        tracker.listeners.append(self.changed)
+
+    def load(self):   # Reads the summary file, if it is from today and the data file is as the tracker read it
+        self._summaries = {}
+        self._day = self.tracker.clock()
+        try:
+            with open(summary_name(self.filename)) as file:
+                data = json.load(file)
+            if data['date'] == self._day.isoformat() and data['files'] == self._state:
+                self._summaries = {int(habit_id): tuple(summary) for habit_id, summary in data['habits'].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):   # Missing or unreadable: worked out again when needed
+            pass
+        self._dirty = False
+
+    def changed(self, operation):   # Tracker listener: forgets the habit that changed (or all of them)
+        if operation['op'] == 'synced':   # Remembers which state of the data file the habits match
+            if operation['file'] == self.filename:
+                self._state = files_state(self.filename)
+            return
+        if operation['op'] == 'reload':
+            self._summaries = {}
+        else:
+            self._summaries.pop(operation['id'], None)
+        self._dirty = True
+
+    def summary(self, habit):   # (current streak, completion rate, last completion or None) of a habit
+        today = self.tracker.clock()
+        if today != self._day:   # Streaks and rates move on with the date
+            self._day = today
+            self._summaries = {}
+
+        summary = self._summaries.get(habit.id)
+        if summary is None:
+            ordinals = habit.completion_ordinals()
+            last = format_completion(ordinals[-1], habit.periodicity) if ordinals else None
+            summary = (analysis.current_streak(habit, today), analysis.completion_rate(habit, today), last)
+            self._summaries[habit.id] = summary
+            self._dirty = True
+        return summary
+
+    def streak(self, habit):
+        return self.summary(habit)[0]
+
+    def save(self):
+        """
+        Writes the summary file if something changed, stamped with the state of the data file
+        the tracker last matched. Does nothing when the tracker holds habits from another file
+        (like the test data), has changes that aren't saved yet, or the data file was changed by
+        something else since, because the summaries wouldn't match the data file.
+        """
+
+        if not self._dirty or self.tracker.source != self.filename or self.tracker.has_changes():
+            return
+        if self._state is None or self._state != files_state(self.filename):
+            return
+        data = {'date': self._day.isoformat(), 'files': self._state,
+            'habits': {str(habit_id): list(summary) for habit_id, summary in self._summaries.items()}}
+
+        try:
+            with write_atomically(summary_name(self.filename), prefix='.summary-', sync=False) as file:   # Only a cache: not worth waiting for the disk
+                json.dump(data, file)
+        except OSError:   # Only a cache: the app works the same without it
+            return
+        self._dirty = False
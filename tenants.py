@@ -0,0 +1,117 @@
+"""
+This file keeps the habits of many users, each in their own data file.
+The files are spread over shard folders (root/ab/alice.json) so that no folder
+grows too big. Only the most recently used trackers stay loaded: when there are
+more than the capacity, the least recently used one is saved (if it changed)
+and dropped, so memory stays the same however many users there are. A tracker
+whose changes can't be saved is never dropped; it stays loaded until a save works.
+"""
+
+
+import hashlib
+import os
+import re
+from collections import OrderedDict
+
+from habit_tracker import HabitTracker
+from storage import open_storage
+
+
+SAFE_USER_ID = re.compile(r'[A-Za-z0-9_-]{1,64}')   # User IDs that can be used as file names as they are
+
+
+class TrackerManager:
+    """
+    Loads, caches and saves one HabitTracker per user
+    Attributes:
+    - root: folder holding the shard folders
+    - capacity: most trackers kept loaded at once
+    - suffix: '.json' for JSON files, '.db' for SQLite databases
+    - stats: dict with the cache hits, misses, evictions, saves and failed saves
+    """
+
+    def __init__(self, root, capacity=64, suffix='.json', lazy=True):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.root = root
+        self.capacity = capacity
+        self.suffix = suffix
+        self.lazy = lazy
+        self._loaded = OrderedDict()   # user id -> (tracker, storage), least recently used first
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'saves': 0, 'failed_saves': 0}
+
+    def path_for(self, user_id):   # Data file of a user: root/<first 2 hex digits of a hash>/<user id>.json
+        user_id = str(user_id)
+        digest = hashlib.sha1(user_id.encode('utf-8')).hexdigest()
+        name = user_id if SAFE_USER_ID.fullmatch(user_id) else digest   # Other IDs could clash or escape the folder
+        return os.path.join(self.root, digest[:2], name + self.suffix)
+
+    def tracker(self, user_id):   # The user's tracker, loaded from disk only if it isn't in the cache
+        user_id = str(user_id)
+        loaded = self._loaded.get(user_id)
+        if loaded is not None:
+            self.stats['hits'] += 1
+            self._loaded.move_to_end(user_id)
+            return loaded[0]
+
+        self.stats['misses'] += 1
+        path = self.path_for(user_id)
+        tracker = HabitTracker()
+        storage = None   # Opened when the new user first saves, so reading a new user creates no files
+        if os.path.exists(path):
+            storage = open_storage(path, lazy=self.lazy)
+            storage.load(tracker)
+        self._loaded[user_id] = (tracker, storage)
+        for old_user in list(self._loaded)[:-1]:   # Least recently used first, never the one just loaded
+            if len(self._loaded) <= self.capacity:
+                break
+            self._evict(old_user)   # Skipped if it can't be saved, so there can be more than capacity for a while
+        return tracker
+
+    def __contains__(self, user_id):   # True if the user's tracker is loaded
+        return str(user_id) in self._loaded
+
+    def __len__(self):   # Number of loaded trackers
+        return len(self._loaded)
+
+    def save(self, user_id):   # Saves a loaded tracker if it has changes. Returns False if they couldn't be saved
+        user_id = str(user_id)
+        tracker, storage = self._loaded[user_id]
+        if not tracker.has_changes():
+            return True
+        if storage is None:   # New user: the shard folder and file are created now
+            path = self.path_for(user_id)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            except OSError:
+                print(f"Error creating the folder for user {user_id}.")
+                self.stats['failed_saves'] += 1
+                return False
+            storage = open_storage(path, lazy=self.lazy)
+            self._loaded[user_id] = (tracker, storage)
+        storage.save_changes(tracker)   # Prints the error and keeps the changes if it fails
+        if tracker.has_changes():
+            self.stats['failed_saves'] += 1
+            return False
+        self.stats['saves'] += 1
+        return True
+
+    def flush(self):   # Saves every loaded tracker that has changes. Returns False if any couldn't be saved
+        saved = True
+        for user_id in list(self._loaded):
+            saved = self.save(user_id) and saved
+        return saved
+
+    def _evict(self, user_id):   # Saves and drops a tracker, unless its changes couldn't be saved
+        if not self.save(user_id):
+            return False
+        tracker, storage = self._loaded.pop(user_id)
+        if storage is not None:
+            storage.close()
+        self.stats['evictions'] += 1
+        return True
+
+    def close(self):   # Saves and drops every tracker. Returns False if some couldn't be saved (those stay loaded)
+        for user_id in list(self._loaded):
+            self._evict(user_id)
+        return not self._loaded
@@ -5,10 +5,34 @@ I wanted to test the main parts only: creating habits, calculating streaks
 and deleting habits. The idea was just to see if it behaves as expected.
 """
 
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
 import unittest
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 from habit import Habit
 from habit_tracker import HabitTracker
+from storage import SQLiteStorage, open_storage
+from benchmarks.generator import generate_habits, write_habits_file
+import analysis
+import atomic_file
+import batch_analysis
+import batch_cli
+import binary_format
+import bulk_io
+import habit_tracker
+import instrumentation
+import main
+import reports
+import scheduler
+import server
+import tenants
 
 class HabitTests(unittest.TestCase):
 
@@ -39,6 +63,916 @@ class HabitTests(unittest.TestCase):
         tracker.delete_habit(habit.id)
         self.assertEqual(len(tracker.habits), 0) # Checks that the list is empty after deleting the habit
 
+    def test_find_habit_by_id_and_name(self): # Habits can be found by ID and by name in any letter case
+        tracker = HabitTracker()
+        habit = tracker.insert_habit("Drink Water", "daily")
+
+        self.assertIs(tracker.get_habit_by_id(habit.id), habit)
+        self.assertIs(tracker.get_habit_by_name("drink water"), habit)
+        tracker.delete_habit(habit.id)
+        self.assertIsNone(tracker.get_habit_by_id(habit.id))
+        self.assertIsNone(tracker.get_habit_by_name("Drink Water"))
+
+    def test_ids_are_not_reused(self): # A new habit never gets the ID of a deleted one
+        tracker = HabitTracker()
+        tracker.insert_habit("First", "daily")
+        second = tracker.insert_habit("Second", "daily")
+        tracker.delete_habit(second.id)
+        third = tracker.insert_habit("Third", "weekly")
+        self.assertEqual(third.id, 3)
+
+        with tempfile.TemporaryDirectory() as folder: # Not after saving and loading again either
+            filename = os.path.join(folder, "habits.json")
+            tracker.delete_habit(third.id)
+            tracker.save_file(filename)
+            loaded = HabitTracker()
+            loaded.load_file(filename)
+            self.assertEqual(loaded.insert_habit("Fourth", "daily").id, 4)
+
+    def test_load_file_builds_lookups(self): # Loaded habits can be found and new IDs continue after them
+        tracker = HabitTracker()
+        tracker.load_file("test_data.json")
+
+        self.assertEqual(tracker.get_habit_by_name("MEDITATION").id, 3)
+        self.assertEqual(tracker.insert_habit("Journal", "daily").id, 6)
+
+    def test_weekly_streak_calculation(self): # Three weeks in a row, given as week keys, make a streak of 3
+        habit = Habit(1, "Clean house", "weekly")
+        today = date.today()
+
+        habit.completions = [f"{day.isocalendar()[0]}-W{day.isocalendar()[1]}"
+            for day in (today, today - timedelta(weeks=1), today - timedelta(weeks=2))]
+
+        self.assertEqual(habit.calculate_streak(), 3)
+
+    def test_completions_are_sorted_without_duplicates(self): # Completions come back oldest first and only once
+        habit = Habit(1, "Read", "daily", completions=["2025-09-04", "2025-09-03", "2025-09-04"])
+
+        self.assertEqual(habit.completions, ["2025-09-03", "2025-09-04"])
+        self.assertEqual(habit.completion_count, 2)
+
+    def test_habits_are_compact(self): # No __dict__ per habit, and older completions are still added only once
+        habit = Habit(1, "Read", "daily", date(2025, 9, 1), ["2025-09-03", "2025-09-05"])
+
+        self.assertFalse(hasattr(habit, "__dict__"))
+        self.assertEqual(habit.creation_date, date(2025, 9, 1))
+        self.assertTrue(habit.add_completion("2025-09-04"))
+        self.assertFalse(habit.add_completion("2025-09-03"))
+        self.assertEqual(habit.completions, ["2025-09-03", "2025-09-04", "2025-09-05"])
+
+    def test_complete_habit_only_once_per_day(self): # Completing twice on the same day counts once
+        habit = Habit(1, "Stretch", "daily")
+        habit.complete_habit()
+        habit.complete_habit()
+
+        self.assertEqual(habit.completions, [date.today().isoformat()])
+        self.assertEqual(habit.calculate_streak(), 1)
+
+    def test_streak_updates_after_completing(self): # The streak grows after completing today without recalculating
+        habit = Habit(1, "Walk", "daily")
+        today = date.today()
+        habit.completions = [(today - timedelta(days=2)).isoformat(), (today - timedelta(days=1)).isoformat()]
+
+        self.assertEqual(habit.calculate_streak(), 0) # Not done today yet
+        habit.complete_habit()
+        before = analysis.streak_cache_info()
+        self.assertEqual(habit.calculate_streak(), 3)
+        after = analysis.streak_cache_info()
+        self.assertEqual(after['hits'], before['hits'] + 1)
+        self.assertEqual(after['misses'], before['misses'])
+
+    def test_longest_and_lowest_streak(self): # Picks the habits with the highest and lowest current streak
+        tracker = HabitTracker()
+        today = date.today()
+        short = tracker.insert_habit("Short", "daily")
+        long = tracker.insert_habit("Long", "daily")
+        short.completions = [today.isoformat()]
+        long.completions = [(today - timedelta(days=1)).isoformat(), today.isoformat()]
+        tracker.insert_habit("None", "daily")
+
+        self.assertIs(analysis.longest_streak(tracker), long)
+        self.assertEqual(analysis.lowest_streak(tracker).name, "None")
+
+    def test_runs_and_best_streak(self): # Runs are joined when a missing day is completed later
+        habit = Habit(1, "Yoga", "daily", completions=["2025-09-01", "2025-09-02", "2025-09-04", "2025-09-10"])
+
+        self.assertEqual(habit.run_count, 3)
+        self.assertEqual(habit.best_streak(), 2)
+        habit.add_completion("2025-09-03")
+        self.assertEqual(habit.runs(), [(date(2025, 9, 1), date(2025, 9, 4)), (date(2025, 9, 10), date(2025, 9, 10))])
+        self.assertEqual(habit.best_streak(), 4)
+        self.assertEqual(analysis.streak_on(habit, date(2025, 9, 3)), 3)
+        self.assertEqual(analysis.streak_on(habit, date(2025, 9, 5)), 0)
+
+    def test_longest_ever_streak(self): # The best streak ever can belong to a habit with no current streak
+        tracker = HabitTracker()
+        tracker.load_file("test_data.json")
+
+        self.assertEqual(analysis.longest_ever_streak(tracker).name, "Got to the gym")
+        self.assertEqual(analysis.best_streak(tracker.get_habit_by_id(4)), 2)
+
+    def test_weekly_streak_across_new_year(self): # Weeks 52, 53 and 1 around New Year are consecutive
+        habit = Habit(1, "Budget", "weekly", completions=["2026-W52", "2026-W53", "2027-W01"])
+
+        self.assertEqual(habit.streak_on(date(2027, 1, 5)), 3)
+        self.assertEqual(habit.completions, ["2026-W52", "2026-W53", "2027-W01"])
+
+    def test_old_weekly_keys_are_migrated(self): # Old keys used the calendar year and no zero padding
+        habit = Habit(1, "Budget", "weekly", completions=["2027-W53", "2027-W1", "2025-W9"])
+
+        self.assertEqual(habit.completions, ["2025-W09", "2026-W53", "2027-W01"])
+
+    def test_completions_over_a_period(self): # Counts, rates, weekly/monthly series and the calendar for chosen dates
+        habit = Habit(1, "Read", "daily", date(2025, 1, 1), ["2025-01-30", "2025-01-31", "2025-02-01", "2025-02-03", "2025-03-01"])
+
+        self.assertEqual(analysis.completions_between(habit, date(2025, 1, 31), date(2025, 2, 28)), 3)
+        self.assertAlmostEqual(analysis.completion_rate_between(habit, date(2025, 2, 1), date(2025, 2, 10)), 20.0)
+        self.assertEqual(analysis.completion_rate_between(habit, date(2024, 1, 1), date(2024, 12, 31)), 0.0) # Before it was created
+        self.assertEqual([(first, count) for first, count, _ in analysis.completion_series(habit, date(2025, 1, 15), date(2025, 3, 31), "month")],
+            [(date(2025, 1, 1), 2), (date(2025, 2, 1), 2), (date(2025, 3, 1), 1)])
+        self.assertEqual([count for _, count, _ in analysis.completion_series(habit, date(2025, 1, 27), date(2025, 2, 9), "week")], [3, 1])
+
+        first_monday, rows = analysis.heatmap(habit, date(2025, 2, 4), weeks=2) # Tuesday of the second week
+        self.assertEqual(first_monday, date(2025, 1, 27))
+        self.assertEqual([row[0] for row in rows], [0, 0, 0, 1, 1, 1, 0])
+        self.assertEqual([row[1] for row in rows], [1, 0, None, None, None, None, None])
+
+        weekly = Habit(2, "Gym", "weekly", date(2025, 1, 1), ["2025-W05"])
+        self.assertEqual(analysis.completions_between(weekly, date(2025, 1, 31), date(2025, 1, 31)), 1) # Any day of the week counts
+
+    def test_streaks_and_rates_on_another_day(self): # A tracker with its own clock, and streaks/rates as of any date
+        today = date(2025, 3, 10)
+        tracker = HabitTracker(clock=lambda: today)
+        habit = tracker.insert_habit("Walk", "daily")
+        for day in (date(2025, 3, 10), date(2025, 3, 12), date(2025, 3, 13)):
+            today = day
+            tracker.complete_habit(habit.id)
+        tracker.complete_habit(habit.id, on=date(2025, 3, 11)) # Filled in later
+
+        self.assertEqual(habit.creation_date, date(2025, 3, 10))
+        self.assertEqual(habit.completions, ["2025-03-10", "2025-03-11", "2025-03-12", "2025-03-13"])
+        self.assertEqual(analysis.current_streak(habit, date(2025, 3, 12)), 3)
+        self.assertEqual(analysis.current_streak(habit, date(2025, 3, 15)), 0)
+        self.assertIs(analysis.longest_streak(tracker), habit) # Uses the tracker's clock
+        self.assertAlmostEqual(analysis.completion_rate(habit, date(2025, 3, 11)), 100.0)
+        self.assertAlmostEqual(analysis.completion_rate(habit, date(2025, 3, 19)), 40.0)
+        self.assertEqual(analysis.completion_rate(habit, date(2025, 3, 1)), 0.0)
+
+        timeline = analysis.streak_timeline(habit, date(2025, 3, 8), date(2025, 3, 15))
+        self.assertEqual([streak for _, streak in timeline], [0, 0, 1, 2, 3, 4, 0, 0])
+        self.assertEqual([streak for _, streak in timeline], [analysis.streak_on(habit, day) for day, _ in timeline])
+        summary = batch_cli.habit_summary(habit, tracker.clock()) # The batch commands and the server use the tracker's day too
+        self.assertEqual((summary["streak"], summary["completion_rate"]), (4, 100.0))
+        self.assertEqual(batch_cli.tracker_stats(tracker)["longest_streak"]["streak"], 4)
+
+    def test_generated_habits_are_repeatable(self): # The benchmark data is the same every time for the same seed
+        first = generate_habits(20, years=1, seed=3, end=date(2025, 1, 1))
+        second = generate_habits(20, years=1, seed=3, end=date(2025, 1, 1))
+
+        self.assertEqual([habit.completions for habit in first], [habit.completions for habit in second])
+        self.assertTrue(all(habit.completion_count > 0 for habit in first))
+
+
+class SavingTests(unittest.TestCase):
+
+    def setUp(self): # Each test saves into its own temporary folder
+        self.folder = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.folder.name, "habits.json")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_changes_are_appended_to_the_log(self): # Small changes go to the log, the JSON file stays as it was
+        tracker = HabitTracker()
+        tracker.insert_habit("Read", "daily")
+        tracker.save_file(self.filename)
+        with open(self.filename) as file:
+            snapshot = file.read()
+
+        gym = tracker.insert_habit("Gym", "weekly")
+        tracker.complete_habit(gym.id)
+        tracker.delete_habit(1)
+        tracker.save_changes(self.filename)
+
+        with open(self.filename) as file:
+            self.assertEqual(file.read(), snapshot)
+        with open(self.filename + ".log") as file:
+            self.assertEqual(len(file.readlines()), 3)
+
+        loaded = HabitTracker()
+        loaded.load_file(self.filename)
+        self.assertEqual([habit.name for habit in loaded.habits], ["Gym"])
+        self.assertEqual(loaded.get_habit_by_id(gym.id).completions, gym.completions)
+
+    def test_long_log_is_compacted(self): # Once the log is too long everything is written to the JSON file again
+        tracker = HabitTracker()
+        tracker.LOG_COMPACT_SIZE = 2
+        tracker.save_file(self.filename)
+        tracker.insert_habit("One", "daily")
+        tracker.save_changes(self.filename)
+        tracker.insert_habit("Two", "daily")
+        tracker.insert_habit("Three", "daily")
+        tracker.save_changes(self.filename)
+
+        self.assertFalse(os.path.exists(self.filename + ".log"))
+        loaded = HabitTracker()
+        loaded.load_file(self.filename)
+        self.assertEqual(len(loaded.habits), 3)
+
+    def test_sqlite_storage_saves_each_change(self): # Habits and completions saved in SQLite come back after loading
+        path = os.path.join(self.folder.name, "habits.db")
+        storage = SQLiteStorage(path)
+        tracker = HabitTracker()
+        storage.load(tracker)
+        read = tracker.insert_habit("Read", "daily")
+        gym = tracker.insert_habit("Gym", "weekly")
+        tracker.complete_habit(read.id)
+        tracker.complete_habit(gym.id)
+        storage.save_changes(tracker)
+        tracker.delete_habit(read.id)
+        storage.save_changes(tracker)
+        storage.close()
+
+        storage = SQLiteStorage(path)
+        loaded = HabitTracker()
+        storage.load(loaded)
+        self.assertEqual([habit.name for habit in loaded.habits], ["Gym"])
+        self.assertEqual(loaded.get_habit_by_id(gym.id).calculate_streak(), 1)
+        self.assertEqual(storage.completion_counts(), {gym.id: 1})
+        storage.close()
+
+    def test_sqlite_habits_added_by_two_connections(self): # The second new habit gets the next ID instead of being dropped
+        path = os.path.join(self.folder.name, "habits.db")
+        first, second = SQLiteStorage(path), SQLiteStorage(path)
+        one, two = HabitTracker(), HabitTracker()
+        first.load(one)
+        second.load(two)
+        with contextlib.redirect_stdout(io.StringIO()):
+            read = one.insert_habit("Read", "daily")
+            one.complete_habit(read.id, date(2025, 1, 6))
+            gym = two.insert_habit("Gym", "weekly")
+            two.complete_habit(gym.id, date(2025, 1, 8))
+            first.save_changes(one)
+            second.save_changes(two)
+
+        self.assertEqual((gym.id, two.get_habit_by_id(2), two.get_habit_by_id(1)), (2, gym, None))
+        loaded = HabitTracker()
+        first.load(loaded)
+        self.assertEqual([(habit.id, habit.name, habit.periodicity, habit.completions) for habit in loaded.habits],
+            [(1, "Read", "daily", ["2025-01-06"]), (2, "Gym", "weekly", ["2025-W02"])])
+        first.close()
+        second.close()
+
+    def test_sqlite_changes_kept_while_database_is_locked(self): # A failed save keeps the changes for the next one
+        path = os.path.join(self.folder.name, "habits.db")
+        storage = SQLiteStorage(path)
+        storage.connection.execute("PRAGMA busy_timeout = 0") # Fails at once instead of waiting for the lock
+        tracker = HabitTracker()
+        storage.load(tracker)
+        other = sqlite3.connect(path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE") # Another connection is writing
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            habit = tracker.insert_habit("Read", "daily")
+            tracker.complete_habit(habit.id, date(2025, 1, 6))
+            storage.save_changes(tracker)
+        self.assertIn("Error saving habits", output.getvalue())
+        self.assertTrue(tracker.has_changes())
+
+        other.execute("COMMIT")
+        other.close()
+        storage.save_changes(tracker)
+        self.assertFalse(tracker.has_changes())
+        loaded = HabitTracker()
+        storage.load(loaded)
+        self.assertEqual([(habit.name, habit.completions) for habit in loaded.habits], [("Read", ["2025-01-06"])])
+        storage.close()
+
+    def test_sqlite_completions_in_range(self): # Only completions inside the dates asked for are returned
+        storage = SQLiteStorage(os.path.join(self.folder.name, "habits.db"))
+        tracker = HabitTracker()
+        tracker.load_file("test_data.json")
+        storage.save_changes(tracker) # Habits from another file are saved all at once
+
+        days = list(storage.completions_in_range(1, date(2025, 9, 4), date(2025, 9, 6)))
+        self.assertEqual(days, [date(2025, 9, 4), date(2025, 9, 6)])
+        self.assertEqual(storage.count_completions_in_range(2, date(2025, 9, 1), date(2025, 9, 30)), 3)
+        storage.close()
+
+    def test_lazy_load_reads_completions_when_needed(self): # Lazy loading gives the same habits but reads completions later
+        eager = HabitTracker()
+        eager.load_file("test_data.json")
+        lazy = HabitTracker()
+        lazy.load_file("test_data.json", lazy=True)
+
+        self.assertEqual([habit.name for habit in lazy.habits], [habit.name for habit in eager.habits])
+        self.assertFalse(any(habit.completions_loaded for habit in lazy.habits))
+        self.assertEqual(lazy.get_habit_by_id(2).completions, eager.get_habit_by_id(2).completions)
+        self.assertEqual([habit.completions_loaded for habit in lazy.habits], [False, True, False, False, False])
+        self.assertEqual([habit.completions for habit in lazy.habits], [habit.completions for habit in eager.habits])
+
+    def test_disk_version_reads_only_the_ends(self): # The version at the start of the file, then the last whole line of the log
+        with open(self.filename, "w") as file:
+            json.dump({"version": 3, "format": 2, "habits": []}, file)
+        self.assertEqual(habit_tracker.disk_version(self.filename), 3)
+        with open(self.filename + ".log", "w") as file:
+            file.write("".join(json.dumps({"op": "delete", "id": 9, "version": version}) + "\n" for version in range(4, 1000)))
+            file.write('{"op": "delete", "id": 9, "version": 1000}\nnot json\n{"op": "del') # A bad line and one still being written
+        self.assertEqual(habit_tracker.disk_version(self.filename), 1000)
+
+    def test_file_with_version_anywhere_loads(self): # A file saved again with sorted keys (version last) doesn't make loading wait forever
+        with open(self.filename, "w") as file:
+            json.dump({"version": 3, "format": 2, "habits": [{"id": 1, "name": "Read", "periodicity": "daily",
+                "creation_date": "2025-01-01", "completions": ["2025-01-02"]}]}, file, sort_keys=True)
+        for lazy in (False, True):
+            tracker = HabitTracker()
+            tracker.load_file(self.filename, lazy=lazy)
+            self.assertEqual((tracker.version, tracker.get_habit_by_id(1).completions), (3, ["2025-01-02"]))
+
+    def test_old_file_is_rewritten_in_new_format(self): # The next save writes the whole file with the new week keys
+        with open(self.filename, "w") as file:
+            json.dump({"habits": [{"id": 1, "name": "Budget", "periodicity": "weekly", "creation_date": "2026-12-01", "completions": ["2027-W53"]}]}, file)
+        tracker = HabitTracker()
+        tracker.load_file(self.filename)
+        tracker.insert_habit("Read", "daily")
+        tracker.save_changes(self.filename)
+
+        self.assertFalse(os.path.exists(self.filename + ".log"))
+        with open(self.filename) as file:
+            data = json.load(file)
+        self.assertEqual(data["format"], 2)
+        self.assertEqual(data["habits"][0]["completions"], ["2026-W53"])
+
+    def test_old_keys_from_new_year_are_read_in_order(self): # 2022-01-01 was written as "2022-W52", in week 52 of 2021
+        habits = [{"id": 1, "name": "Budget", "periodicity": "weekly", "creation_date": "2021-12-20", "completions": ["2021-W51", "2022-W52", "2022-W1"]},
+            {"id": 2, "name": "Clean", "periodicity": "weekly", "creation_date": "2022-12-01", "completions": ["2022-W51", "2022-W52"]}, # End of 2022
+            {"id": 3, "name": "Plants", "periodicity": "weekly", "creation_date": "2024-12-01", "completions": ["2024-W52", "2024-W1"]}] # 2024-12-30
+        with open(self.filename, "w") as file:
+            json.dump({"habits": habits}, file)
+        tracker = HabitTracker()
+        tracker.load_file(self.filename, lazy=True)
+
+        self.assertEqual(tracker.get_habit_by_id(1).completions, ["2021-W51", "2021-W52", "2022-W01"])
+        self.assertEqual(tracker.get_habit_by_id(2).completions, ["2022-W51", "2022-W52"])
+        self.assertEqual(tracker.get_habit_by_id(3).completions, ["2024-W52", "2025-W01"])
+        self.assertEqual(tracker.get_habit_by_id(1).streak_on(date(2022, 1, 5)), 3)
+
+        habits[0]["completions"] = ["2022-W52"] # Alone, it can still be read as week 52 of 2022, unless that week hadn't come yet
+        with open(self.filename, "w") as file:
+            json.dump({"habits": habits[:1]}, file)
+        tracker = HabitTracker(clock=lambda: date(2022, 1, 1))
+        tracker.load_file(self.filename)
+        self.assertEqual(tracker.get_habit_by_id(1).completions, ["2021-W52"])
+
+    def run_batch(self, *argv, rows=""): # Runs a batch command and returns its JSON output lines
+        stdout = io.StringIO()
+        batch_cli.main(["--file", self.filename, *argv], stdin=io.StringIO(rows), stdout=stdout)
+        return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    def test_batch_import_saves_once(self): # A CSV of completions is applied and saved in one go
+        rows = "name,periodicity,creation_date,date\n" + "".join(
+            f"Read,daily,2025-01-01,{(date(2025, 1, 1) + timedelta(days=day)).isoformat()}\n" for day in range(50))
+        rows += "Gym,monthly,,2025-01-01\n"
+        summary, = self.run_batch("import", rows=rows)
+
+        self.assertEqual(summary["changed"], 50)
+        self.assertEqual(summary["errors"], [{"line": 52, "error": "periodicity must be 'daily' or 'weekly', not 'monthly'"}])
+        with open(self.filename + ".log") as file:
+            self.assertEqual(len(file.readlines()), 51) # One insert and 50 completions, appended together
+
+        listed, = self.run_batch("list")
+        self.assertEqual((listed["name"], listed["completions"], listed["best_streak"]), ("Read", 50, 50))
+
+    def test_export_and_import_history(self): # CSV and column exports import into a new file with the same habits
+        self.run_batch("import", rows="name,periodicity,creation_date,date\nRead,daily,2025-01-01,2025-01-02\n"
+            "Read,daily,,2025-01-03\nGym,weekly,2025-01-01,2025-01-07\nNap,daily,2025-01-01,\n")
+        csv_rows = io.StringIO()
+        batch_cli.main(["--file", self.filename, "export"], stdout=csv_rows)
+        columns = io.StringIO()
+        batch_cli.main(["--file", self.filename, "--format", "columns", "export"], stdout=columns)
+        self.assertEqual(csv_rows.getvalue().splitlines()[1:], ["Read,daily,2025-01-01,2025-01-02",
+            "Read,daily,2025-01-01,2025-01-03", "Gym,weekly,2025-01-01,2025-01-06", "Nap,daily,2025-01-01,"])
+
+        for exported in (csv_rows.getvalue(), columns.getvalue()):
+            copy = os.path.join(self.folder.name, "copy.json")
+            for name in (copy, copy + ".log"):
+                if os.path.exists(name):
+                    os.remove(name)
+            batch_cli.main(["--file", copy, "import"], stdin=io.StringIO(exported), stdout=io.StringIO())
+            again = io.StringIO()
+            batch_cli.main(["--file", copy, "export"], stdout=again)
+            self.assertEqual(again.getvalue(), csv_rows.getvalue())
+
+    def test_imported_habit_starts_on_its_first_completion(self): # Not on the day of the import, which made rates over 100%
+        summary, = self.run_batch("import", rows="name,periodicity,creation_date,date\nRead,daily,,2024-03-02\n"
+            "Read,daily,,2024-03-01\nRead,daily,,2024-03-03\nGym,weekly,2024-03-06,2024-03-04\nGym,weekly,,2024-02-26\n")
+        self.assertEqual((summary["changed"], [error["line"] for error in summary["errors"]]), (4, [6])) # The week before Gym was created
+
+        tracker = HabitTracker()
+        tracker.load_file(self.filename)
+        read = tracker.get_habit_by_name("Read")
+        self.assertEqual(read.creation_date, date(2024, 3, 1))
+        self.assertEqual(analysis.completion_rate(read, date(2024, 3, 3)), 100.0)
+        self.assertEqual(tracker.get_habit_by_name("Gym").completions, ["2024-W10"]) # Monday of the week it was created in
+
+    def test_import_checks_rows_in_batches(self): # Repeats and bad rows are counted in every batch, saving as it goes
+        rows = [(1, {"name": "Read", "periodicity": "daily", "date": f"2025-01-{day:02d}"}) for day in range(1, 29)]
+        rows += [(29, {"name": "Read", "periodicity": "daily", "date": "2025-01-01"}), (30, None),
+            (31, {"name": "Read", "periodicity": "weekly", "date": "2025-02-01"}), (32, {"name": "Gym", "periodicity": "daily", "date": "2025-W06"})]
+        tracker = HabitTracker()
+        saves = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = bulk_io.import_rows(tracker, iter(rows), lambda: saves.append(len(tracker.get_habit_by_name("Read").completions)), batch_size=4)
+
+        self.assertEqual((summary["rows"], summary["changed"], summary["unchanged"], summary["error_count"]), (32, 28, 1, 3))
+        self.assertEqual([error["line"] for error in summary["errors"]], [30, 31, 32])
+        self.assertEqual(saves, [4, 8, 16, 28]) # Each save waits for as many new rows as were saved before
+
+    def test_batch_complete_from_json_lines(self): # Completions by name or ID, with or without a date
+        summary, = self.run_batch("add", rows="name,periodicity,creation_date\nRead,daily,2025-09-01\nGym,weekly,2025-09-03\n")
+        summary, = self.run_batch("complete", rows='{"name": "read"}\n{"id": 2, "date": "2025-09-01"}\nnot json\n'
+            '{"id": 1, "date": "2025-08-31"}\n') # Monday of the week Gym was created, and a day before Read was
+
+        self.assertEqual((summary["changed"], [error["line"] for error in summary["errors"]]), (2, [3, 4]))
+        stats, = self.run_batch("stats")
+        self.assertEqual((stats["habits"], stats["completions"]), (2, 2))
+        self.assertEqual(stats["longest_streak"]["name"], "Read")
+
+    def test_batch_rows_with_a_name_that_is_not_text(self): # Reported as errors, the other rows are still applied
+        summary, = self.run_batch("add", rows='{"name": 5, "periodicity": "daily"}\n{"name": "Read", "periodicity": "daily"}\n')
+        self.assertEqual((summary["changed"], [error["line"] for error in summary["errors"]]), (1, [1]))
+        summary, = self.run_batch("complete", rows='{"name": "Read"}\n{"name": ["Read"]}\n')
+        self.assertEqual((summary["changed"], [error["line"] for error in summary["errors"]]), (1, [2]))
+        stats, = self.run_batch("stats")
+        self.assertEqual((stats["habits"], stats["completions"]), (1, 1))
+
+    def test_lists_use_the_summary_file(self): # The second start lists habits without reading completions
+        today = date.today()
+        tracker = HabitTracker()
+        habit = tracker.insert_habit("Read", "daily")
+        tracker.add_completion(habit.id, (today - timedelta(days=1)).isoformat())
+        tracker.insert_habit("Gym", "weekly")
+        tracker.save_file(self.filename)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            first = main.HabitTrackerCLI(self.filename)
+            first.start()
+            first.list_all_habits() # Works out the streaks and writes the summary file
+            second = main.HabitTrackerCLI(self.filename)
+            second.start()
+            second.list_all_habits()
+        self.assertFalse(any(habit.completions_loaded for habit in second.tracker.habits))
+        self.assertEqual(second.summaries.summary(second.tracker.get_habit_by_id(1))[2], (today - timedelta(days=1)).isoformat())
+        self.assertEqual(os.stat(self.filename + ".summary").st_mode & 0o777, atomic_file.NEW_FILE_MODE) # Not left private like a temporary file
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            second.tracker.complete_habit(1)
+            second.storage.save_changes(second.tracker)
+        self.assertEqual(second.summaries.streak(second.tracker.get_habit_by_id(1)), 2) # Only this habit is worked out again
+        self.assertFalse(second.tracker.get_habit_by_id(2).completions_loaded)
+
+        with open(self.filename + ".summary", "w") as file: # A damaged summary file is ignored
+            file.write("{")
+        with contextlib.redirect_stdout(io.StringIO()):
+            third = main.HabitTrackerCLI(self.filename)
+            third.start()
+        self.assertEqual(third.summaries.streak(third.tracker.get_habit_by_id(1)), 2)
+
+    def test_summary_file_not_written_for_older_habits(self): # A list made before another process saved doesn't hide its changes
+        tracker = HabitTracker()
+        with contextlib.redirect_stdout(io.StringIO()):
+            tracker.insert_habit("Read", "daily")
+            tracker.save_file(self.filename)
+            menu = main.HabitTrackerCLI(self.filename)
+            menu.start()
+            cron = HabitTracker()
+            cron.load_file(self.filename)
+            cron.complete_habit(1)
+            cron.save_changes(self.filename)
+            menu.list_all_habits() # Still the habits as loaded before the completion
+            fresh = main.HabitTrackerCLI(self.filename)
+            fresh.start()
+        self.assertEqual(menu.summaries.streak(menu.tracker.get_habit_by_id(1)), 0)
+        self.assertEqual(fresh.summaries.streak(fresh.tracker.get_habit_by_id(1)), 1)
+
+    def test_binary_file_round_trip(self): # JSON -> binary -> JSON keeps every habit, completion and the version
+        write_habits_file(self.filename, 20, years=2)
+        tracker = HabitTracker()
+        tracker.load_file(self.filename)
+        tracker.add_completion(1, "2020-02-29") # Also in the log, not only the JSON file
+        tracker.save_changes(self.filename)
+        binary_name = os.path.join(self.folder.name, "habits.hbin")
+        copy_name = os.path.join(self.folder.name, "copy.json")
+
+        binary_format.json_to_binary(self.filename, binary_name)
+        binary_format.binary_to_json(binary_name, copy_name)
+        copy = HabitTracker()
+        copy.load_file(copy_name)
+        self.assertEqual(copy.version, tracker.version)
+        for original, converted in zip(tracker.habits, copy.habits):
+            self.assertEqual((converted.id, converted.name, converted.periodicity, converted.creation_date, converted.completions),
+                (original.id, original.name, original.periodicity, original.creation_date, original.completions))
+        self.assertLess(os.path.getsize(binary_name), os.path.getsize(copy_name) / 3)
+
+        snapshot = binary_format.BinarySnapshot(binary_name) # Completions read straight from the file
+        ordinals = snapshot.ordinals(0)
+        self.assertEqual(list(ordinals), list(tracker.habits[0].completion_ordinals()))
+        self.assertEqual(snapshot.count_between(0, ordinals[0], ordinals[-1]), len(ordinals))
+        ordinals.release()
+        snapshot.close()
+
+    def test_binary_storage(self): # A .hbin data file works like the JSON file
+        binary_name = os.path.join(self.folder.name, "habits.hbin")
+        storage = open_storage(binary_name)
+        tracker = HabitTracker()
+        storage.load(tracker)
+        habit = tracker.insert_habit("Café", "weekly")
+        tracker.add_completion(habit.id, "2025-W01")
+        storage.save_changes(tracker)
+
+        loaded = HabitTracker()
+        open_storage(binary_name).load(loaded)
+        self.assertEqual(loaded.get_habit_by_id(habit.id).completions, ["2025-W01"])
+        self.assertEqual(loaded.get_habit_by_id(habit.id).name, "Café")
+        self.assertEqual(loaded.version, 1)
+
+def save_from_another_process(filename, worker, rounds): # Adds habits and completions from a tracker that was loaded once
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracker = HabitTracker()
+        tracker.LOG_COMPACT_SIZE = 40 # Small, so the JSON file is also rewritten while others are saving
+        tracker.load_file(filename)
+        for number in range(rounds):
+            habit = tracker.insert_habit(f"Worker {worker} habit {number}", "daily")
+            tracker.add_completion(habit.id, "2025-01-01")
+            tracker.add_completion(1, (date(2025, 1, 1) + timedelta(days=worker * rounds + number)).isoformat())
+            tracker.save_changes(filename)
+
+
+class ConcurrencyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.folder.name, "habits.json")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_two_trackers_merge_their_changes(self): # Neither tracker loses what the other one saved
+        first = HabitTracker()
+        first.insert_habit("Shared", "daily")
+        first.save_file(self.filename)
+        second = HabitTracker()
+        second.load_file(self.filename)
+
+        first.insert_habit("From first", "daily")
+        first.add_completion(1, "2025-01-01")
+        first.save_changes(self.filename)
+        mine = second.insert_habit("From second", "weekly") # Gets ID 2 as well, until it is saved
+        second.add_completion(1, "2025-01-02")
+        second.add_completion(mine.id, "2025-01-02")
+        second.save_changes(self.filename)
+
+        self.assertEqual(mine.id, 3)
+        loaded = HabitTracker()
+        loaded.load_file(self.filename)
+        self.assertEqual([habit.name for habit in loaded.habits], ["Shared", "From first", "From second"])
+        self.assertEqual(loaded.get_habit_by_id(1).completions, ["2025-01-01", "2025-01-02"])
+        self.assertEqual(loaded.get_habit_by_id(3).completion_count, 1)
+        self.assertEqual(loaded.version, second.version)
+
+    def test_many_processes_saving_at_once(self): # Processes saving at the same time lose nothing
+        tracker = HabitTracker()
+        tracker.insert_habit("Shared", "daily")
+        tracker.save_file(self.filename)
+
+        workers, rounds = 4, 25
+        context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+        processes = [context.Process(target=save_from_another_process, args=(self.filename, worker, rounds)) for worker in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        loaded = HabitTracker()
+        loaded.load_file(self.filename)
+        self.assertEqual(len(loaded.habits), 1 + workers * rounds)
+        self.assertEqual(len({habit.name for habit in loaded.habits}), 1 + workers * rounds)
+        self.assertEqual(loaded.get_habit_by_id(1).completion_count, workers * rounds)
+        self.assertTrue(all(habit.completion_count == 1 for habit in loaded.habits[1:]))
+
+
+class ServerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.folder.name, "habits.json")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    async def request(self, port, method, path, body=None): # One request on its own connection, returns (status, JSON)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        data = b"" if body is None else json.dumps(body).encode()
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+        response = await reader.read()
+        writer.close()
+        head, _, payload = response.partition(b"\r\n\r\n")
+        return int(head.split()[1]), json.loads(payload)
+
+    def test_requests_change_the_tracker_and_are_saved_later(self): # Reads come from memory, writes reach the file on flush
+        tracker = HabitTracker()
+        tracker.insert_habit("Read", "daily")
+        tracker.save_file(self.filename)
+
+        async def scenario():
+            app = server.HabitServer(open_storage(self.filename), flush_interval=60)
+            port = await app.start(port=0)
+            status, gym = await self.request(port, "POST", "/habits", {"name": "Gym", "periodicity": "weekly"})
+            self.assertEqual((status, gym["id"]), (201, 2))
+            status, gym = await self.request(port, "POST", "/habits/2/complete")
+            self.assertEqual((status, gym["streak"]), (200, 1))
+            self.assertEqual((await self.request(port, "GET", "/habits?periodicity=weekly"))[1]["habits"], [gym])
+            self.assertEqual((await self.request(port, "GET", "/analysis/longest-streak"))[1]["name"], "Gym")
+            self.assertEqual((await self.request(port, "GET", "/habits/9"))[0], 404)
+            self.assertEqual((await self.request(port, "PUT", "/habits"))[0], 405)
+            self.assertEqual((await self.request(port, "POST", "/habits", {"name": "Bad"}))[0], 400)
+            self.assertEqual((await self.request(port, "POST", "/habits", {"name": 5, "periodicity": "daily"}))[0], 400)
+            self.assertEqual((await self.request(port, "POST", "/habits", ["Bad"]))[0], 400)
+            self.assertEqual(len((await self.request(port, "GET", "/habits"))[1]["habits"]), 2) # Nothing half added
+
+            on_disk = HabitTracker()
+            on_disk.load_file(self.filename)
+            self.assertEqual(len(on_disk.habits), 1) # Not flushed yet
+            await app.stop()
+
+        asyncio.run(scenario())
+        loaded = HabitTracker()
+        loaded.load_file(self.filename)
+        self.assertEqual(loaded.get_habit_by_name("Gym").completion_count, 1)
+
+    def test_changes_are_saved_to_a_database(self): # The worker thread that saves can use the SQLite connection
+        path = os.path.join(self.folder.name, "habits.db")
+
+        async def scenario():
+            app = server.HabitServer(open_storage(path), flush_interval=60)
+            port = await app.start(port=0)
+            self.assertEqual((await self.request(port, "POST", "/habits", {"name": "Read", "periodicity": "daily"}))[0], 201)
+            await app.flush()
+            self.assertFalse(app.tracker.has_changes())
+            self.assertEqual((await self.request(port, "POST", "/habits/1/complete"))[0], 200)
+            await app.stop()
+            app.storage.close()
+
+        asyncio.run(scenario())
+        storage = SQLiteStorage(path)
+        loaded = HabitTracker()
+        storage.load(loaded)
+        self.assertEqual([(habit.name, habit.completion_count) for habit in loaded.habits], [("Read", 1)])
+        storage.close()
+
+    def test_bad_body_length_closes_the_connection(self): # Answered with 400 instead of reading a body that never comes
+        async def scenario():
+            app = server.HabitServer(open_storage(self.filename), flush_interval=60)
+            port = await app.start(port=0)
+            for length in ("abc", str(server.MAX_BODY + 1)):
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(f"POST /habits HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode())
+                response = await asyncio.wait_for(reader.read(), 5) # read() only returns once the server closes the connection
+                writer.close()
+                self.assertIn(b" 400 ", response.split(b"\r\n")[0])
+                self.assertIn(b"Connection: close", response)
+            self.assertEqual((await self.request(port, "GET", "/habits"))[0], 200) # Still serving
+            await app.stop()
+
+        asyncio.run(scenario())
+
+
+class TenantTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_least_recently_used_tracker_is_saved_and_dropped(self): # Only two trackers stay loaded
+        manager = tenants.TrackerManager(self.folder.name, capacity=2)
+        manager.tracker("alice").insert_habit("Read", "daily")
+        manager.tracker("bob")
+        self.assertFalse(os.path.exists(manager.path_for("bob"))) # Reading a new user creates no file
+        manager.tracker("alice") # Alice is now used more recently than Bob
+        manager.tracker("carol")
+
+        self.assertEqual(len(manager), 2)
+        self.assertNotIn("bob", manager)
+        self.assertTrue(manager.tracker("alice").get_habit_by_name("Read")) # Still cached, nothing saved yet
+        self.assertFalse(os.path.exists(manager.path_for("alice")))
+
+        manager.tracker("dave") # Evicts carol (unchanged), then...
+        manager.tracker("erin") # ...alice, who is saved on the way out
+        self.assertEqual(manager.stats["evictions"], 3)
+        self.assertEqual(manager.stats["saves"], 1)
+        self.assertEqual(manager.tracker("alice").get_habit_by_name("Read").periodicity, "daily")
+        manager.close()
+
+    def test_tracker_that_cannot_be_saved_stays_loaded(self): # A failed save is not counted and the changes are kept
+        manager = tenants.TrackerManager(self.folder.name, capacity=1)
+        os.makedirs(manager.path_for("alice")) # A folder where alice's file should be
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager.tracker("alice").insert_habit("Read", "daily")
+            manager.tracker("bob")
+        self.assertIn("alice", manager)
+        self.assertEqual((manager.stats["saves"], manager.stats["failed_saves"], manager.stats["evictions"]), (0, 1, 0))
+
+        os.rmdir(manager.path_for("alice"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager.tracker("carol") # Now alice can be saved, and bob has nothing to save
+        self.assertEqual(len(manager), 1)
+        self.assertEqual((manager.stats["saves"], manager.stats["evictions"]), (1, 2))
+        self.assertTrue(manager.close())
+        self.assertTrue(manager.tracker("alice").get_habit_by_name("Read"))
+
+    def test_user_files_are_sharded(self): # Users go into hashed shard folders, odd IDs get a hashed file name
+        manager = tenants.TrackerManager(self.folder.name)
+        path = manager.path_for("alice")
+        self.assertEqual(os.path.basename(path), "alice.json")
+        self.assertEqual(len(os.path.basename(os.path.dirname(path))), 2)
+        self.assertNotIn("..", manager.path_for("../etc/passwd"))
+        manager.tracker("../etc/passwd").insert_habit("Gym", "weekly")
+        manager.flush()
+        self.assertTrue(os.path.exists(manager.path_for("../etc/passwd")))
+
+
+class SchedulerTests(unittest.TestCase):
+
+    def setUp(self): # A tracker whose clock can be moved by the test
+        self.today = date(2025, 3, 5) # A Wednesday
+        self.tracker = HabitTracker(clock=lambda: self.today)
+
+    def test_deadlines_follow_completions(self): # Due by the end of the next day/week, and gone once it is missed
+        with contextlib.redirect_stdout(io.StringIO()):
+            read = self.tracker.insert_habit("Read", "daily", date(2025, 3, 1))
+            gym = self.tracker.insert_habit("Gym", "weekly", date(2025, 3, 1))
+            nap = self.tracker.insert_habit("Nap", "daily")
+            planner = scheduler.Scheduler(self.tracker)
+            self.tracker.complete_habit(read.id, date(2025, 3, 4))
+            self.tracker.complete_habit(gym.id, date(2025, 2, 26))
+
+        morning = datetime(2025, 3, 5, 9)
+        self.assertEqual([(due, habit.name) for due, habit in planner.due_within(24, morning)],
+            [(datetime(2025, 3, 6), "Read"), (datetime(2025, 3, 6), "Nap")])
+        self.assertEqual([habit.name for _, habit in planner.at_risk(24, morning)], ["Read"]) # Nap has no streak to lose
+        self.assertEqual(planner.next_due(gym.id), datetime(2025, 3, 10)) # End of this week
+        self.assertEqual(planner.due_within(6, morning), [])
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.tracker.complete_habit(read.id) # Today: due by the end of tomorrow
+            self.tracker.delete_habit(nap.id)
+        self.assertEqual([(due, habit.name) for due, habit in planner.due_within(5 * 24, morning)],
+            [(datetime(2025, 3, 7), "Read"), (datetime(2025, 3, 10), "Gym")])
+        self.assertEqual([habit.name for _, habit in planner.overdue(datetime(2025, 3, 8))], ["Read"])
+        self.assertEqual(planner.overdue(morning), []) # The clock can go back
+
+    def test_uses_the_time_of_day(self): # Without now=, a tracker on the real clock is asked at the current time, not midnight
+        tracker = HabitTracker()
+        with contextlib.redirect_stdout(io.StringIO()):
+            read = tracker.insert_habit("Read", "daily")
+            tracker.complete_habit(read.id)
+        planner = scheduler.Scheduler(tracker)
+        hours_left = (planner.next_due(read.id) - datetime.now()).total_seconds() / 3600 # Between 24 and 48
+        self.assertEqual([habit.name for _, habit in planner.due_within(hours_left + 0.5)], ["Read"])
+        self.assertEqual(planner.due_within(hours_left - 0.5), [])
+
+        planner = scheduler.Scheduler(self.tracker) # A tracker with its own clock: the start of its day
+        self.assertEqual(planner.now(), datetime(2025, 3, 5))
+
+    def test_simulated_week_with_100k_habits(self): # Queries stay correct while a simulated clock moves and habits change
+        habits = generate_habits(100000, days=6, end=self.today - timedelta(days=1))
+        self.tracker.habits = habits
+        planner = scheduler.Scheduler(self.tracker)
+        rng = random.Random(0)
+
+        start = datetime.combine(self.today, datetime.min.time())
+        for hour in range(0, 72, 6): # Three days, 6 hours at a time
+            now = start + timedelta(hours=hour)
+            self.today = now.date()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for habit_id in rng.sample(range(1, 100001), 500):
+                    if self.tracker.get_habit_by_id(habit_id):
+                        self.tracker.complete_habit(habit_id)
+                self.tracker.delete_habit(rng.randrange(1, 100001))
+                self.tracker.insert_habit(f"New {hour}", "daily")
+
+            due = planner.due_within(12, now)
+            limit = scheduler.moment(now) + 0.5
+            expected = sorted((scheduler.deadline(habit), habit.id) for habit in self.tracker.habits
+                if scheduler.moment(now) < scheduler.deadline(habit) <= limit)
+            self.assertEqual([(due.toordinal(), habit.id) for due, habit in due], expected)
+
+        at_risk = planner.at_risk(24, now)
+        self.assertTrue(at_risk)
+        for due, habit in at_risk: # Done in the day/week before the one that is due, not yet in that one
+            before = due.date() - timedelta(days=2 if habit.periodicity == "daily" else 8)
+            self.assertGreater(habit.streak_on(before), 0)
+            self.assertEqual(scheduler.streak_at_stake(habit), habit.streak_on(before))
+        overdue = planner.overdue(now)
+        self.assertTrue(all(habit.calculate_streak(as_of=self.today) == 0 for _, habit in overdue))
+        self.assertEqual(len(overdue) + len(planner.due_within(24 * 14, now)), len(self.tracker.habits))
+
+
+class ReportTests(unittest.TestCase):
+
+    def test_report_is_the_same_with_any_number_of_workers(self): # Worker processes only change the speed
+        with tempfile.TemporaryDirectory() as folder:
+            completions = sum(write_habits_file(os.path.join(folder, f"user_{number}.json"), 5, seed=number) for number in range(6))
+            with open(os.path.join(folder, "broken.json"), "w") as file:
+                file.write("{not json")
+            filenames = reports.find_data_files([folder])
+
+            report = reports.run_report(filenames, workers=1)
+            self.assertEqual(reports.run_report(filenames, workers=2, chunk_size=2), report)
+
+        self.assertEqual((report["files"], report["habits"], report["completions"]), (6, 30, completions))
+        self.assertEqual(report["errors"], [{"file": filenames[0], "error": "could not be loaded"}])
+        streaks = [item["streak"] for item in report["top_streaks"]]
+        self.assertEqual(streaks, sorted(streaks, reverse=True))
+
+
+class InstrumentationTests(unittest.TestCase):
+
+    def test_hot_paths_are_measured_only_when_enabled(self): # Calls, times and bytes are recorded, then the originals come back
+        original_load = HabitTracker.load_file
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, "habits.json")
+            copy = os.path.join(folder, "copy.json")
+            write_habits_file(filename, 10)
+            instrumentation.reset()
+            instrumentation.enable()
+            try:
+                tracker = HabitTracker()
+                tracker.load_file(filename)
+                for habit in tracker.habits:
+                    analysis.current_streak(habit)
+                tracker.add_completion(1, "2020-01-01")
+                tracker.save_changes(filename)
+                tracker.save_changes(copy) # Another file: save_changes writes it with save_file
+                report = instrumentation.report()
+            finally:
+                instrumentation.disable()
+
+            self.assertIs(HabitTracker.load_file, original_load)
+            self.assertEqual(report["HabitTracker.load_file"]["bytes_read"], os.path.getsize(filename))
+            self.assertEqual(report["HabitTracker.save_changes"]["bytes_written"], os.path.getsize(filename + ".log") + os.path.getsize(copy))
+            self.assertEqual((report["HabitTracker.save_file"]["calls"], report["HabitTracker.save_file"]["bytes_written"]), (1, 0)) # Counted once
+        self.assertEqual(report["analysis.current_streak"]["calls"], 10)
+        self.assertEqual(report["Habit.calculate_streak"]["calls"], 10)
+        self.assertLessEqual(report["Habit.calculate_streak"]["p50_ms"], report["Habit.calculate_streak"]["max_ms"])
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(instrumentation.profile(sum, [1, 2, 3]), 6)
+
+
+@unittest.skipIf(batch_analysis.np is None, "NumPy is not installed")
+class BatchAnalysisTests(unittest.TestCase):
+
+    def make_tracker(self): # A few habits with streaks that end today, earlier or never started
+        tracker = HabitTracker()
+        tracker.load_file("test_data.json")
+        today = date.today()
+        running = tracker.insert_habit("Running", "daily")
+        running.completions = [(today - timedelta(days=day)).isoformat() for day in (0, 1, 2, 5, 6)]
+        weekly = tracker.insert_habit("Call family", "weekly")
+        weekly.completions = [(today - timedelta(weeks=week)).isoformat() for week in (0, 1, 3)]
+        tracker.insert_habit("Empty", "daily")
+        return tracker
+
+    def test_batch_matches_one_habit_at_a_time(self): # Streaks and rates are the same as in analysis.py
+        tracker = self.make_tracker()
+        batch = batch_analysis.HabitBatch(tracker.habits)
+
+        self.assertEqual(list(batch.current_streaks()), [analysis.current_streak(habit) for habit in tracker.habits])
+        for batch_rate, habit in zip(batch.completion_rates(), tracker.habits):
+            self.assertAlmostEqual(batch_rate, analysis.completion_rate(habit))
+        self.assertIs(batch_analysis.longest_streak(tracker), analysis.longest_streak(tracker))
+        self.assertIs(batch_analysis.lowest_streak(tracker), analysis.lowest_streak(tracker))
+
+        for as_of in (date(2025, 9, 5), date(2025, 8, 1)): # During the test data, and before any habit was created
+            batch = batch_analysis.HabitBatch(tracker.habits, as_of)
+            self.assertEqual(list(batch.current_streaks()), [analysis.current_streak(habit, as_of) for habit in tracker.habits])
+            for batch_rate, habit in zip(batch.completion_rates(), tracker.habits):
+                self.assertAlmostEqual(batch_rate, analysis.completion_rate(habit, as_of))
+        self.assertEqual(batch_analysis.completion_rates(tracker.habits, date(2025, 9, 5))[1], 20.0) # 1 of 5 days, later ones not counted
+
+    def test_longest_runs_and_gaps(self): # Runs and gaps over the whole history of each habit
+        tracker = self.make_tracker()
+        batch = batch_analysis.HabitBatch(tracker.habits)
+        longest_gaps, average_gaps = batch.gap_stats()
+
+        self.assertEqual(list(batch.longest_runs()), [2, 1, 1, 2, 1, 3, 2, 0])
+        self.assertEqual(list(batch.longest_runs()), [analysis.best_streak(habit) for habit in tracker.habits])
+        self.assertEqual(list(longest_gaps), [1, 2, 1, 0, 0, 2, 1, 0])
+        self.assertAlmostEqual(average_gaps[5], 0.5)
+
 
 if __name__ == "__main__":  # Run the tests only when this file is executed directly
     unittest.main()